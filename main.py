@@ -11,26 +11,61 @@ python -m pip install sudachipy sudachidict_core
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
-import sudachipy  # SudachiPy (Apache-2.0); sudachi-dictionary-full includes IPA data under BSD notice that must accompany redistribution
 import re
-from functools import lru_cache
+import sys
 from pathlib import Path
 from typing import Optional
 from collections import Counter
-import matplotlib.pyplot as plt
 from matplotlib import font_manager
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import itertools
+from concurrent.futures import ThreadPoolExecutor
 import csv
 import io
-from PIL import Image
 import numpy as np
 
+from services.cooccurrence import CooccurrenceService
 from services.files import FileService
-from services.tokenization import TokenizationService
-from services.visualization import VisualizationService
-
-
+from services.tokenization import TokenizationService, create_sudachi_tokenizer_factory
+
+
+# 既定のストップワード（インスタンスごとに作り直さないよう1回だけ構築する）。
+# 解析結果の表層形と同じく intern しておき、集合の照合を参照比較で済ませる
+_STOP_WORDS_DEFAULT = frozenset(map(sys.intern, [
+    '（','）','(',')','［','］','[',']','{','}','【','】','※','→','⇒','…','‥','…','—','〜','%','!','?','！？','?!',
+    'へと','よりも','つつ','ながらも','だろ','だろう','でしょう','です','でした','ますが','ません','ませんでした','んで','のでしょう','のでした',
+    'ところ','ところが','ところで','ために','ための','ためには','わけ','わけで','わけでは','はず','はずが','はずだ','ものの','ものと','ことが','ことに','ことから','それぞれ','それぞれの','ように','ような','ようで',
+    'こんな','そんな','あんな','どの','どれ','どう','どういった','ここ','そこ','あそこ','どこ','こちら','そちら','あちら',
+    'まず','次に','そして','一方','ただ','だが','その結果','結果として','つまり','要するに',
+    '的','的な','的に','等','等の','等について','化','性',
+    '0','1','2','3','4','5','6','7','8','9',
+    '０','１','２','３','４','５','６','７','８','９',
+    '年','月','日','時','分','％',
+    'の', 'に', 'は', 'を', 'た', 'が', 'で', 'て', 'と', 'し', 
+    'れ', 'さ', 'ある', 'いる', 'も', 'する', 'から', 'な', 'こと', 
+    'として', 'い', 'や', 'れる', 'など', 'なっ', 'ない', 'この', 'ため', 
+    'その', 'あっ', 'よう', 'また', 'もの', 'という', 'あり', 'まで', 'られ', 
+    'なる', 'へ', 'か', 'だ', 'これ', 'によって', 'により', 'おり', 'より', 
+    'による', 'ず', 'なり', 'られる', 'において', 'ば', 'なかっ', 'なく', 
+    'しかし', 'について', 'せ', 'だっ', 'その後', 'できる', 'それ', 
+    'う', 'ので', 'なお', 'のみ', 'でき', 'き', 'つ', 'における', 
+    'および', 'いう', 'さらに', 'でも', 'ら', 'たり', 'その他', 
+    'に関する', 'たち', 'ます', 'ん', 'なら', 'に対して', '特に', 
+    'せる', 'あるいは', 'まし', 'ながら', 'ただし', 'かつて', 
+    'ください', 'なし', 'これら', 'それら',"、","。","・",
+    "「","」","『","』","〈","〉","《","》","．","，","：","；","！","？"
+]))
+
+# 共起ペア一覧の Treeview に表示する最大行数（CSV 出力は全件）
+_COOC_TABLE_MAX_ROWS = 1000
+
+# 「サンプルテキスト」で読み込む文章
+_SAMPLE_TEXT = """人工知能は現代社会において重要な技術となっています。機械学習やディープラーニングの発展により、
+画像認識や自然言語処理などの分野で大きな進歩がありました。これらの技術は医療診断、自動運転、
+音声認識など様々な応用分野で活用されています。今後も人工知能技術の発展により、
+社会の様々な課題解決に貢献することが期待されています。データ分析の重要性も高まっており、
+ビッグデータを活用した意思決定が多くの企業で行われています。テクノロジーの進化は
+私たちの生活を大きく変えつつあります。人工知能の発展は目覚ましく、機械学習アルゴリズムの
+改善により精度が向上しています。自然言語処理技術も進歩し、より自然な対話が可能になりました。"""
 
 
 class JapaneseTextAnalyzer:
@@ -58,59 +93,73 @@ class JapaneseTextAnalyzer:
 
         # Sudachi 形態素解析
         try:
-            config = sudachipy.Config()
-            dictionary = sudachipy.Dictionary(config)
-            self.sudachi = dictionary.create()
+            # 行単位の並列解析ではワーカースレッドごとに同じ辞書から tokenizer を作る
+            sudachi_factory = create_sudachi_tokenizer_factory()
+            self.sudachi = sudachi_factory()
         except Exception:
             messagebox.showerror("警告", "Sudachiが見つかりません")
             self.sudachi = None
+            sudachi_factory = None
 
-        self.token_service = TokenizationService(self.sudachi) if self.sudachi else None
+        self.token_service = (
+            TokenizationService(self.sudachi, tokenizer_factory=sudachi_factory) if self.sudachi else None
+        )
         self.file_service = FileService()
-        self.visual_service = VisualizationService()
+        # 可視化まわり（matplotlib の描画系・networkx・wordcloud）は起動時には読み込まず、最初に使うときに読み込む
+        self._visual_service = None
+        # ファイル読み込みや WordCloud / ネットワークの計算など、時間のかかる処理を Tk のメインループから外すためのワーカー
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._sample_warmed = False  # サンプルテキストの解析キャッシュを温め済みか
+        self._busy = set()  # 実行中のバックグラウンド処理の種類（同じ処理の重複投入を防ぐ）
+        self._pending = {}  # 実行中に同じ種類が再度依頼されたときの最新の依頼（種類 -> 依頼し直す関数）
+        # 可視化タブごとの (Figure, FigureCanvasTkAgg)。再生成時はクリアして使い回す
+        self._figure_canvases = {}
+        # 可視化の種類ごとの (入力のキー, 計算結果)。入力が前回と同じなら重い計算を省いて描画だけ行う
+        self._visual_cache = {}
 
 
         # データ保持
         self.original_text = ""
         self.tokens = []
         self.word_freq = Counter()
-        self.pos_cache = []
+        # 語彙単位の SoA: 語彙リスト / トークンの語彙 id 配列 / 語彙ごとの回数 / 語彙ごとの品詞
+        self._vocab = []
+        self._ids = np.zeros(0, dtype=np.int32)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._pos_by_vocab = np.zeros(0, dtype=object)
         self.original_lines = []  # 【新機能】行情報を保持
+        self._surface_to_pos = {}  # 分かち書き時の一括解析で得た surface -> 品詞
+        self._sorted_freq = []        # word_freq.most_common() のキャッシュ
+        self._sorted_freq_lower = []  # 検索用: (小文字化した語, 語, 回数)
+        self._filter_after_id = None  # 検索のデバウンス用 after ID
+        self._last_search = ""        # 直前に絞り込んだ検索語（小文字）
+        self._last_matches = []       # 直前の絞り込み結果（_sorted_freq_lower の部分列）
+        self._freq_source_text = None  # word_freq を集計したときの編集エリアの内容
+        self._edit_text = None         # 編集エリアの内容（strip 済み）。ウィジェットの modified フラグが立つまで使い回す
+        self._filtered_key = None      # (テキスト, 最小出現回数): _filtered_freq を求めたときの条件
+        self._filtered_freq = {}
 
         # --- 追加: 分かち書き（ストップワード除去前）行情報と連語ルール ---
         self.pre_tokens_lines = []          # 各行ごとの Sudachi 分かち書き（ストップワード除去前）
-        self.merge_rules = []               # ルールリスト: {"len":n, "seq":tuple(...), "merged": "結合語"}
-
-        # ストップワード
-        self.stop_words = set([
-            '（','）','(',')','［','］','[',']','{','}','【','】','※','→','⇒','…','‥','…','—','〜','%','!','?','！？','?!',
-            'へと','よりも','つつ','ながらも','だろ','だろう','でしょう','です','でした','ますが','ません','ませんでした','んで','のでしょう','のでした',
-            'ところ','ところが','ところで','ために','ための','ためには','わけ','わけで','わけでは','はず','はずが','はずだ','ものの','ものと','ことが','ことに','ことから','それぞれ','それぞれの','ように','ような','ようで',
-            'こんな','そんな','あんな','どの','どれ','どう','どういった','ここ','そこ','あそこ','どこ','こちら','そちら','あちら',
-            'まず','次に','そして','一方','ただ','だが','その結果','結果として','つまり','要するに',
-            '的','的な','的に','等','等の','等について','化','性',
-            '0','1','2','3','4','5','6','7','8','9',
-            '０','１','２','３','４','５','６','７','８','９',
-            '年','月','日','時','分','％',
-            'の', 'に', 'は', 'を', 'た', 'が', 'で', 'て', 'と', 'し', 
-            'れ', 'さ', 'ある', 'いる', 'も', 'する', 'から', 'な', 'こと', 
-            'として', 'い', 'や', 'れる', 'など', 'なっ', 'ない', 'この', 'ため', 
-            'その', 'あっ', 'よう', 'また', 'もの', 'という', 'あり', 'まで', 'られ', 
-            'なる', 'へ', 'か', 'だ', 'これ', 'によって', 'により', 'おり', 'より', 
-            'による', 'ず', 'なり', 'られる', 'において', 'ば', 'なかっ', 'なく', 
-            'しかし', 'について', 'せ', 'だっ', 'その後', 'できる', 'それ', 
-            'う', 'ので', 'なお', 'のみ', 'でき', 'き', 'つ', 'における', 
-            'および', 'いう', 'さらに', 'でも', 'ら', 'たり', 'その他', 
-            'に関する', 'たち', 'ます', 'ん', 'なら', 'に対して', '特に', 
-            'せる', 'あるいは', 'まし', 'ながら', 'ただし', 'かつて', 
-            'ください', 'なし', 'これら', 'それら',"、","。","・",
-            "「","」","『","』","〈","〉","《","》","．","，","：","；","！","？"
-
-        ])
+        self.merge_rules = {}               # 連語ルール: {語列タプル: "結合語"}（追加順 = 一覧の表示順）
+        self._merge_trie = None             # merge_rules のトライ木（ルールの追加・削除で作り直す）
+        self._merge_rule_keys = []          # merge_rule_listbox の各行に対応する語列タプル
+
+        # ストップワード（既定値をコピーし、ユーザー編集はインスタンス側の set に対して行う）
+        self.stop_words = set(_STOP_WORDS_DEFAULT)
 
         self.setup_ui()
         self.refresh_stopword_list()
 
+    @property
+    def visual_service(self):
+        """VisualizationService を初回アクセス時に import して作る（メインスレッドから呼ぶこと）"""
+        if self._visual_service is None:
+            from services.visualization import VisualizationService
+
+            self._visual_service = VisualizationService()
+        return self._visual_service
+
     def setup_ui(self):
         # =============================
         # ttk の日本語フォント設定（Meiryo）
@@ -125,11 +174,12 @@ class JapaneseTextAnalyzer:
         # 全 ttk ウィジェットにデフォルトフォントを適用
         style = ttk.Style()
 
-        # 通常のウィジェット（Label, Button, Entryなど）
-        style.configure(".", font=font_config["normal"])
-        style.configure("TLabel", font=font_config["normal"])
-        style.configure("TButton", font=font_config["normal"])
-        style.configure("TEntry", font=font_config["normal"])
+        # 通常のウィジェット（Label, Button, Entryなど）: 現在のテーマにまとめて1回で設定する
+        normal = {"configure": {"font": font_config["normal"]}}
+        style.theme_settings(
+            style.theme_use(),
+            {".": normal, "TLabel": normal, "TButton": normal, "TEntry": normal},
+        )
 
 
             
@@ -141,6 +191,11 @@ class JapaneseTextAnalyzer:
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
+        # バックグラウンド処理中だけ表示する進捗バー（所要時間は分からないので indeterminate）
+        self._progress = ttk.Progressbar(main_frame, mode="indeterminate")
+        self._progress.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(4, 0))
+        self._progress.grid_remove()
+
         # タブ1: テキスト入力
         self.setup_input_tab()
 
@@ -267,7 +322,7 @@ class JapaneseTextAnalyzer:
         search_frame.pack(fill=tk.X, pady=5)
         ttk.Label(search_frame, text="検索:").pack(side=tk.LEFT, padx=5)
         self.search_var = tk.StringVar()
-        self.search_var.trace('w', self.filter_word_list)
+        self.search_var.trace_add("write", self._schedule_filter)
         ttk.Entry(search_frame, textvariable=self.search_var, width=20).pack(side=tk.LEFT, fill=tk.X, expand=True)
 
         # 単語リスト
@@ -556,9 +611,75 @@ class JapaneseTextAnalyzer:
                 messagebox.showerror("エラー", f"ファイルの読み込みに失敗しました: {e}")
 
     def load_csv_file(self, filepath):
-        """CSVファイルを読み込み、指定列のテキストを結合（エンコーディング/区切り検出付き）"""
+        """CSVファイルを読み込み、指定列のテキストを結合（エンコーディング/区切り検出付き）
+
+        デコードと行分割はワーカースレッドで行い、完了を after でポーリングしてから列選択ダイアログを出す。
+        """
+        self._run_in_background(
+            "csv",
+            lambda: self.file_service.detect_csv_content(filepath),
+            self.show_csv_column_dialog,
+            "CSVファイルの読み込みに失敗しました",
+        )
+
+    def _run_in_background(self, key, task, on_done, error_message):
+        """task をワーカースレッドで実行し、完了後にメインスレッドで on_done(結果) を呼ぶ。
+
+        Tk はメインスレッドからしか触れないため、完了は after でポーリングして拾う。
+        同じ key の処理が実行中なら最新の依頼だけを覚えておき、実行中の処理が終わったらその結果を捨てて
+        覚えておいた依頼を実行する（設定を変えて押し直した場合に新しい設定が反映されるように）。
+        """
+        if key in self._busy:
+            self._pending[key] = lambda: self._run_in_background(key, task, on_done, error_message)
+            return
+        if not self._busy:
+            self._progress.grid()
+            self._progress.start(10)
+        self._busy.add(key)
+        self.root.config(cursor="watch")
+        future = self._executor.submit(task)
+        self.root.after(50, self._poll_background, key, future, on_done, error_message)
+
+    def _run_cached(self, key, inputs, task, on_done, error_message):
+        """inputs が前回の key の計算時と同じなら結果を使い回し、違えば _run_in_background で計算し直す"""
+        if key in self._busy:
+            # 実行中の計算の後で、キャッシュの判定からやり直す
+            self._pending[key] = lambda: self._run_cached(key, inputs, task, on_done, error_message)
+            return
+        cached = self._visual_cache.get(key)
+        if cached is not None and cached[0] == inputs:
+            on_done(cached[1])
+            return
+
+        def done(result):
+            self._visual_cache[key] = (inputs, result)
+            on_done(result)
+
+        self._run_in_background(key, task, done, error_message)
+
+    def _poll_background(self, key, future, on_done, error_message):
+        if not future.done():
+            self.root.after(50, self._poll_background, key, future, on_done, error_message)
+            return
+        self._busy.discard(key)
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            # 実行中に依頼し直されていれば、古い設定での結果は表示せずに最新の依頼を実行する
+            pending()
+        if not self._busy:
+            self.root.config(cursor="")
+            self._progress.stop()
+            self._progress.grid_remove()
+        if pending is not None:
+            return
+        try:
+            on_done(future.result())
+        except Exception as e:
+            messagebox.showerror("エラー", f"{error_message}: {e}")
+
+    def show_csv_column_dialog(self, detection):
+        """検出済みの CSV 内容から結合する列を選ばせ、テキストエリアへ反映する"""
         try:
-            detection = self.file_service.detect_csv_content(filepath)
             rows = detection.rows
             if not rows:
                 messagebox.showwarning("警告", "CSVファイルが空です。")
@@ -650,17 +771,15 @@ class JapaneseTextAnalyzer:
             messagebox.showerror("エラー", f"CSVファイルの読み込みに失敗しました: {e}")
 
     def load_sample(self):
-        sample = """人工知能は現代社会において重要な技術となっています。機械学習やディープラーニングの発展により、
-画像認識や自然言語処理などの分野で大きな進歩がありました。これらの技術は医療診断、自動運転、
-音声認識など様々な応用分野で活用されています。今後も人工知能技術の発展により、
-社会の様々な課題解決に貢献することが期待されています。データ分析の重要性も高まっており、
-ビッグデータを活用した意思決定が多くの企業で行われています。テクノロジーの進化は
-私たちの生活を大きく変えつつあります。人工知能の発展は目覚ましく、機械学習アルゴリズムの
-改善により精度が向上しています。自然言語処理技術も進歩し、より自然な対話が可能になりました。"""
+        sample = _SAMPLE_TEXT
         self.text_area.delete(1.0, tk.END)
         self.text_area.insert(1.0, sample)
         # 【改善】サンプル用に行情報を初期化
         self.original_lines = sample.split('\n')
+        # 続けて解析されることが多いので、行単位の解析キャッシュをワーカースレッドで先に温めておく
+        if self.token_service and not self._sample_warmed:
+            self._sample_warmed = True
+            self._executor.submit(self.token_service.split_lines, self.original_lines)
 
     def clear_text(self):
         self.text_area.delete(1.0, tk.END)
@@ -683,31 +802,60 @@ class JapaneseTextAnalyzer:
             return
 
         self.tokens = result.tokens
-        self.pos_cache = result.pos_cache
         self.word_freq = result.word_freq
+        self._freq_source_text = None
         self.pre_tokens_lines = result.pre_tokens_lines
         self.original_lines = result.original_lines
+        self._surface_to_pos = result.surface_to_pos
 
-        self.edit_area.delete(1.0, tk.END)
-        self.edit_area.insert(1.0, " ".join(self.tokens))
+        self._set_edit_text(" ".join(self.tokens))
         self.refresh_word_list()
 
         self.notebook.select(self.notebook.index("2. 単語編集") if "2. 単語編集" in [self.notebook.tab(i, option="text") for i in range(self.notebook.index("end"))] else 1)
         messagebox.showinfo("完了", f"{len(self.tokens)}個の単語を抽出しました。")
 
+    def _update_frequency(self, text):
+        """編集エリアの内容から頻度表と語彙 id 配列を作り直す（前回の集計時から変わっていなければ使い回す）"""
+        if text == self._freq_source_text:
+            return
+        self._set_frequency_tokens(text.split(), text)
+
+    def _set_frequency_tokens(self, tokens, text):
+        """トークン列から頻度表と語彙 id 配列を作り、text（編集エリアの内容）の集計結果として記録する"""
+        self.tokens = tokens
+        # トークン列は語彙 id（初出順）の int32 配列として保持し、頻度はその id 配列の bincount で求める
+        # 語彙は intern し、品詞辞書（解析時に intern 済みの表層形がキー）やストップワードとの照合を参照比較で済ませる
+        self._vocab = list(map(sys.intern, dict.fromkeys(self.tokens)))
+        index = {w: i for i, w in enumerate(self._vocab)}
+        self._ids = np.fromiter(map(index.__getitem__, self.tokens), dtype=np.int32, count=len(self.tokens))
+        self._counts = np.bincount(self._ids, minlength=len(self._vocab))
+        self.word_freq = Counter(dict(zip(self._vocab, self._counts.tolist())))
+        self._sorted_freq = self.word_freq.most_common()
+        self._sorted_freq_lower = [(w.lower(), w, c) for w, c in self._sorted_freq]
+        self._freq_source_text = text
+        # 品詞は語彙ごとに1回だけ辞書で引き、辞書にない語（手入力した語など）だけをまとめて解析する
+        pos = list(map(self._surface_to_pos.get, self._vocab))
+        unknown = [w for w, p in zip(self._vocab, pos) if p is None]
+        if unknown:
+            resolved = self.token_service.pos_of_many(unknown) if self.token_service else [""] * len(unknown)
+            self._surface_to_pos.update(zip(unknown, resolved))
+            pos = list(map(self._surface_to_pos.get, self._vocab))
+        self._pos_by_vocab = np.array(pos, dtype=object)
+
     def refresh_word_list(self):
-        text = self.edit_area.get(1.0, tk.END).strip()
-        self.tokens = text.split()
-        self.word_freq = Counter(self.tokens)
-        self.pos_cache = [self.get_pos(t) for t in self.tokens]  # get_pos below uses cached Ochasen tagging
+        text = self._get_edit_text()
+        self._update_frequency(text)
 
         # 【改善】編集内容を行単位のトークン列として保持し、共起ネットワークに反映
-        self.original_lines = [" ".join(line.split()) for line in text.split('\n') if line.split()]
+        self.original_lines = [" ".join(words) for words in map(str.split, text.split('\n')) if words]
 
         # リスト更新
         self.word_listbox.delete(0, tk.END)
-        for word, count in self.word_freq.most_common():
-            self.word_listbox.insert(tk.END, f"{word} ({count}回)")
+        items = [f"{word} ({count}回)" for word, count in self._sorted_freq]
+        if items:
+            self.word_listbox.insert(tk.END, *items)
+        self._last_search = ""
+        self._last_matches = self._sorted_freq_lower
 
         # ストップワード表示も更新
         self.refresh_stopword_list()
@@ -716,14 +864,14 @@ class JapaneseTextAnalyzer:
         if not hasattr(self, "stopword_listbox"):
             return
         self.stopword_listbox.delete(0, tk.END)
-        for w in sorted(self.stop_words):
-            self.stopword_listbox.insert(tk.END, w)
+        if self.stop_words:
+            self.stopword_listbox.insert(tk.END, *sorted(self.stop_words))
 
     def add_stop_word(self):
         word = self.stopword_entry.get().strip()
         if not word:
             return
-        self.stop_words.add(word)
+        self.stop_words.add(sys.intern(word))
         self.stopword_entry.delete(0, tk.END)
         self.refresh_stopword_list()
         self.apply_stop_words()
@@ -737,38 +885,69 @@ class JapaneseTextAnalyzer:
         self.refresh_stopword_list()
         self.apply_stop_words()
 
+    def _get_edit_text(self):
+        """編集エリアの内容（strip 済み）を返す。前回の取得・書き込みから編集されていなければ Tk から読み直さない"""
+        if self._edit_text is None or self.edit_area.edit_modified():
+            self.edit_area.edit_modified(False)
+            self._edit_text = self.edit_area.get(1.0, tk.END).strip()
+        return self._edit_text
+
+    def _set_edit_text(self, text):
+        """編集エリアの内容を text で置き換え、書き込んだ内容を _get_edit_text のキャッシュにする"""
+        self.edit_area.delete(1.0, tk.END)
+        self.edit_area.insert(1.0, text)
+        self.edit_area.edit_modified(False)
+        self._edit_text = text.strip()
+
+    def _set_edit_tokens(self, tokens):
+        """編集エリアをトークン列で置き換える。集計も同時に済ませ、直後の refresh で再分割しないようにする
+
+        tokens は編集エリアを分割して得た語（空白を含まない）に限る。
+        """
+        text = " ".join(tokens)
+        self._set_edit_text(text)
+        self._set_frequency_tokens(tokens, text)
+
     def apply_stop_words(self):
         # Listbox をソースとして self.stop_words を同期
         if hasattr(self, "stopword_listbox"):
-            self.stop_words = set(self.stopword_listbox.get(0, tk.END))
+            self.stop_words = set(map(sys.intern, self.stopword_listbox.get(0, tk.END)))
 
-        text = self.edit_area.get(1.0, tk.END).strip()
+        text = self._get_edit_text()
         if not text:
             return
-        words = text.split()
-        filtered = [w for w in words if w not in self.stop_words]
-        self.edit_area.delete(1.0, tk.END)
-        self.edit_area.insert(1.0, " ".join(filtered))
+        # ストップワードを語彙 id に変換し、id 配列に対する np.isin で一括除去
+        self._update_frequency(text)
+        stops = self.stop_words
+        stop_ids = np.fromiter(
+            (i for i, w in enumerate(self._vocab) if w in stops), dtype=np.int32
+        )
+        kept_ids = self._ids[np.isin(self._ids, stop_ids, invert=True, kind="table")] if len(stop_ids) else self._ids
+        self._set_edit_tokens([self._vocab[i] for i in kept_ids.tolist()])
         self.refresh_word_list()
 
+    def _schedule_filter(self, *args):
+        """連続したキー入力をまとめ、最後の入力から150ms後に1回だけ絞り込む"""
+        if self._filter_after_id is not None:
+            self.root.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.root.after(150, self.filter_word_list)
+
     def filter_word_list(self, *args):
-        search_term = self.search_var.get()
+        self._filter_after_id = None
+        search_term = self.search_var.get().lower()
+        # 前回の検索語を含む検索語なら、一致候補は前回の結果に限られる（1文字ずつ打ち足す場合）
+        candidates = self._last_matches if self._last_search in search_term else self._sorted_freq_lower
+        matches = [entry for entry in candidates if search_term in entry[0]]
+        previous = self._last_matches
+        self._last_search = search_term
+        self._last_matches = matches
+        # 絞り込み結果が表示中のものと同じなら Listbox には触れない（打ち足しても候補が減らない場合など）
+        if matches == previous:
+            return
+        items = [f"{word} ({count}回)" for _, word, count in matches]
         self.word_listbox.delete(0, tk.END)
-
-        for word, count in self.word_freq.most_common():
-            if search_term.lower() in word.lower():
-                self.word_listbox.insert(tk.END, f"{word} ({count}回)")
-
-    @lru_cache(maxsize=4096)
-    def get_pos(self, word: str) -> str:
-        if not word or not self.sudachi:
-            return ""
-        tokens = self.sudachi.tokenize(word)
-        if not tokens:
-            return ""
-        pos_field = tokens[0].part_of_speech()[0]
-        return pos_field if pos_field else ""
-
+        if items:
+            self.word_listbox.insert(tk.END, *items)
 
     def apply_visual_font_family(self, family: str, notify: bool = False):
         """
@@ -875,7 +1054,9 @@ class JapaneseTextAnalyzer:
         ttk.Label(pos_window, text="保持したい品詞を複数選択してください").pack(pady=8)
 
         # 現在の品詞分布を取得
-        current_pos_counts = Counter(self.pos_cache)
+        current_pos_counts = Counter()
+        for pos, count in zip(self._pos_by_vocab, self._counts.tolist()):
+            current_pos_counts[pos] += count
         if not current_pos_counts:
             ttk.Label(pos_window, text="品詞情報がありません。").pack(pady=6)
             return
@@ -892,8 +1073,8 @@ class JapaneseTextAnalyzer:
         scroll.config(command=self.pos_listbox.yview)
 
         # 表示用に "品詞 (件数)" を入れる（後で分割して品詞部分だけを取り出す）
-        for pos, cnt in sorted(current_pos_counts.items(), key=lambda x: (-x[1], x[0])):
-            self.pos_listbox.insert(tk.END, f"{pos} ({cnt}件)")
+        pos_items = [f"{pos} ({cnt}件)" for pos, cnt in sorted(current_pos_counts.items(), key=lambda x: (-x[1], x[0]))]
+        self.pos_listbox.insert(tk.END, *pos_items)
 
         # ヘルプ行
         ttk.Label(pos_window, text="※選択した品詞のみが残ります。選択なしはキャンセル。", foreground="gray").pack(pady=(4,0))
@@ -910,14 +1091,15 @@ class JapaneseTextAnalyzer:
                 pos_str = item.split(' (')[0]
                 selected_pos.add(pos_str)
 
-            # self.tokens と self.pos_cache を同時走査して、選択品詞のみ保持
-            filtered_tokens = [t for t, p in zip(self.tokens, self.pos_cache) if p in selected_pos]
+            # 語彙ごとの保持フラグを作り、トークンの id 配列に対してマスクで選択品詞のみ保持
+            keep_vocab = np.fromiter((p in selected_pos for p in self._pos_by_vocab), dtype=bool, count=len(self._vocab))
+            kept_ids = self._ids[keep_vocab[self._ids]]
+            filtered_tokens = [self._vocab[i] for i in kept_ids.tolist()]
 
             # 編集エリアへ反映
-            self.edit_area.delete(1.0, tk.END)
-            self.edit_area.insert(1.0, " ".join(filtered_tokens))
+            self._set_edit_tokens(filtered_tokens)
 
-            # refresh 状態（word_freq, pos_cache などを更新）
+            # refresh 状態（word_freq, 語彙 id 配列などを更新）
             self.refresh_word_list()
 
             pos_window.destroy()
@@ -934,13 +1116,9 @@ class JapaneseTextAnalyzer:
         item = self.word_listbox.get(selection[0])
         word = item.split(' (')[0]
 
-        # 編集エリアから削除
-        text = self.edit_area.get(1.0, tk.END)
-        words = text.split()
-        words = [w for w in words if w != word]
-
-        self.edit_area.delete(1.0, tk.END)
-        self.edit_area.insert(1.0, ' '.join(words))
+        # 編集エリアから削除（分割済みのトークン列を使い、テキストは分割し直さない）
+        self._update_frequency(self._get_edit_text())
+        self._set_edit_tokens([w for w in self.tokens if w != word])
 
         self.refresh_word_list()
 
@@ -951,12 +1129,10 @@ class JapaneseTextAnalyzer:
         if not from_word:
             return
 
-        text = self.edit_area.get(1.0, tk.END)
-        words = text.split()
-        words = [to_word if w == from_word else w for w in words]
-
-        self.edit_area.delete(1.0, tk.END)
-        self.edit_area.insert(1.0, ' '.join(words))
+        self._update_frequency(self._get_edit_text())
+        # 置換後の語が空白を含む場合もあるため、トークン列は結合後のテキストから作る
+        text = ' '.join([to_word if w == from_word else w for w in self.tokens])
+        self._set_edit_text(text)
 
         self.refresh_word_list()
         self.replace_from.delete(0, tk.END)
@@ -964,28 +1140,34 @@ class JapaneseTextAnalyzer:
 
     def visualize(self):
         # 編集された単語を取得
-        text = self.edit_area.get(1.0, tk.END).strip()
+        text = self._get_edit_text()
         if not text:
             messagebox.showwarning("警告", "単語データがありません。")
             return
 
-        tokens = text.split()
-        word_freq = Counter(tokens)
-
         # 最小出現回数でフィルタリング
+        tokens, filtered_freq = self._get_filtered(text)
         min_freq = self.min_freq_var.get()
-        filtered_freq = {k: v for k, v in word_freq.items() if v >= min_freq}
 
         if not filtered_freq:
             messagebox.showwarning("警告", f"最小出現回数{min_freq}回以上の単語がありません。")
             return
 
+        # WordCloud と共起ネットワークはバックグラウンドで計算されるため、両方の描画が終わってから完了を知らせる。
+        # 計算に失敗した場合はそれぞれのエラー表示だけが出る
+        remaining = [2]
+
+        def on_shown():
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                messagebox.showinfo("完了", "可視化が完了しました。")
+
         try:
             # WordCloud生成
-            self.generate_wordcloud(filtered_freq)
+            self.generate_wordcloud(filtered_freq, on_shown=on_shown)
 
             # 共起ネットワーク生成
-            self.generate_network(tokens, filtered_freq)
+            self.generate_network(tokens, filtered_freq, on_shown=on_shown)
 
             # 頻度グラフ生成
             self.generate_frequency_chart(filtered_freq)
@@ -995,7 +1177,43 @@ class JapaneseTextAnalyzer:
 
         # タブ切り替え
         self.notebook.select(2)
-        messagebox.showinfo("完了", "可視化が完了しました。")
+
+    def _get_filtered(self, text, dedup_per_line=False):
+        """編集エリアのテキストから (トークン列, 最小出現回数以上の頻度) を返す。
+
+        通常の集計は同じテキスト・同じ最小出現回数なら前回の結果を使い回す。
+        dedup_per_line が True なら行ごとに重複を除いて数える（共起ネットワークと同じ行の扱い）。
+        """
+        min_freq = self.min_freq_var.get()
+        self._update_frequency(text)
+        if dedup_per_line and self.original_lines:
+            word_freq = self._count_words_once_per_line()
+            return self.tokens, {k: v for k, v in word_freq.items() if v >= min_freq}
+        key = (text, min_freq)
+        if self._filtered_key != key:
+            # 語彙 id ごとの回数配列から閾値以上の id を一括で選び、語彙順（word_freq と同じ順）の辞書にする
+            kept = np.flatnonzero(self._counts >= min_freq).tolist()
+            vocab = self._vocab
+            self._filtered_freq = dict(zip([vocab[i] for i in kept], self._counts[kept].tolist()))
+            self._filtered_key = key
+        return self.tokens, self._filtered_freq
+
+    def _count_words_once_per_line(self):
+        """各行で同じ語を1回だけ数えた頻度（pre_tokens_lines を優先し、なければ original_lines から）"""
+        # 行ごとの重複排除結果を連結したジェネレータで Counter.update を1回だけ呼び、全行分のトークンリストは作らない
+        word_freq = Counter()
+        if self.pre_tokens_lines:
+            # 分かち書き後: ストップワード除去・長さ条件を適用してから、初出順を保って行内で重複排除する
+            # （set では実行ごとに順序が変わり、同数の語の順位が起動のたびに入れ替わる）
+            stops = self.stop_words
+            word_freq.update(itertools.chain.from_iterable(
+                dict.fromkeys(s for s in surfaces if s not in stops and len(s) > 1)
+                for surfaces in self.pre_tokens_lines
+                if surfaces
+            ))
+        else:
+            word_freq.update(itertools.chain.from_iterable(dict.fromkeys(line.split()) for line in self.original_lines))
+        return word_freq
 
     def select_wordcloud_image(self):
         """WordCloud用のカスタム画像を選択"""
@@ -1005,104 +1223,172 @@ class JapaneseTextAnalyzer:
         if filepath:
             self.wc_custom_image_var.set(filepath)
 
-    def generate_wordcloud(self, word_freq):
-        for widget in self.wordcloud_frame.winfo_children():
-            widget.destroy()
-
-        width = getattr(self, "wc_width_var", tk.IntVar(value=1000)).get()
-        height = getattr(self, "wc_height_var", tk.IntVar(value=600)).get()
-        shape = getattr(self, "wc_shape_var", tk.StringVar(value="rectangle")).get()
-        custom_image = getattr(self, "wc_custom_image_var", tk.StringVar(value="")).get()
-
-        fig = self.visual_service.build_wordcloud_figure(
-            word_freq,
-            width=width,
-            height=height,
-            shape=shape,
-            font_path=self.resolve_wordcloud_font_path(),
-            custom_image_path=custom_image,
-        )
+    def _figure_canvas(self, key, frame):
+        """タブごとに Figure / FigureCanvasTkAgg を1組だけ作り、キャンバス以外の子ウィジェットを片付けて返す
 
-        canvas = FigureCanvasTkAgg(fig, self.wordcloud_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        キャンバスは配置したまま残し、再生成のたびに pack し直して Agg バッファを作り直させないようにする。
+        Figure の大きさはキャンバスのウィジェットに合わせて決まり、描画側の figsize では変えない。
+        """
+        pair = self._figure_canvases.get(key)
+        if pair is None:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from matplotlib.figure import Figure
+
+            fig = Figure()
+            pair = self._figure_canvases[key] = (fig, FigureCanvasTkAgg(fig, frame))
+            pair[1].get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        canvas_widget = pair[1].get_tk_widget()
+        for widget in frame.winfo_children():
+            if widget is not canvas_widget:
+                widget.destroy()
+        if not canvas_widget.winfo_manager():
+            canvas_widget.pack(fill=tk.BOTH, expand=True)
+        return pair
+
+    def generate_wordcloud(self, word_freq, on_shown=None):
+        """WordCloud の配置計算はワーカースレッドで行い、描画だけをメインスレッドで行う
+
+        on_shown を渡すと、描画が終わったあとに引数なしで呼ぶ。
+        """
+        font_path = self.resolve_wordcloud_font_path()
+        width = self.wc_width_var.get()
+        height = self.wc_height_var.get()
+        shape = self.wc_shape_var.get()
+        custom_image = self.wc_custom_image_var.get()
+        # 初回の import はメインスレッドで済ませ、ワーカーには読み込み済みのサービスだけを渡す
+        visual_service = self.visual_service
+
+        def compute():
+            return visual_service.compute_wordcloud(
+                word_freq,
+                width=width,
+                height=height,
+                shape=shape,
+                font_path=font_path,
+                custom_image_path=custom_image,
+            )
+
+        def show(wc):
+            fig, canvas = self._figure_canvas("wordcloud", self.wordcloud_frame)
+            self.visual_service.draw_wordcloud(wc, fig=fig)
+            canvas.draw_idle()
 
-        ttk.Button(self.wordcloud_frame, text="画像として保存",
-                   command=lambda: self.save_figure(fig, "wordcloud")).pack(pady=5)
+            ttk.Button(self.wordcloud_frame, text="画像として保存",
+                       command=lambda: self.save_figure(fig, "wordcloud")).pack(pady=5)
 
-        if not (self.font_path or self.resolve_wordcloud_font_path()):
-            ttk.Label(self.wordcloud_frame, text="※日本語フォントが見つからないため、文字化けする可能性があります。", foreground="red").pack(pady=5)
+            if not (self.font_path or font_path):
+                ttk.Label(self.wordcloud_frame, text="※日本語フォントが見つからないため、文字化けする可能性があります。", foreground="red").pack(pady=5)
+            if on_shown:
+                on_shown()
+
+        # マスク画像は差し替えや上書きに気づけるよう更新時刻もキーに含める
+        try:
+            mask_mtime = Path(custom_image).stat().st_mtime if shape == "custom" and custom_image else None
+        except OSError:
+            mask_mtime = None
+        inputs = (frozenset(word_freq.items()), width, height, shape, font_path, custom_image, mask_mtime)
+        self._run_cached("wordcloud", inputs, compute, show, "WordCloud の生成中に問題が発生しました")
 
-    def generate_network(self, tokens, word_freq):
-        for widget in self.network_frame.winfo_children():
-            widget.destroy()
+    def generate_network(self, tokens, word_freq, on_shown=None):
+        """共起の集計・レイアウト・コミュニティ分割はワーカースレッドで行い、描画だけをメインスレッドで行う
 
+        on_shown を渡すと、描画が終わったあとに引数なしで呼ぶ。
+        """
         window_size = self.window_var.get()
-        edge_count = getattr(self, "net_edge_count_var", tk.IntVar(value=50)).get()
-        self_loop_mode = getattr(self, "self_loop_var", tk.StringVar(value="remove")).get()
-        window_mode = getattr(self, "window_mode_var", tk.StringVar(value="sliding")).get()
-        collapse_consecutive = getattr(self, "collapse_consecutive_var", tk.BooleanVar(value=False)).get()
-        dedup_pairs_per_line = getattr(self, "dedup_pairs_per_line_var", tk.BooleanVar(value=False)).get()
-        min_cooc = getattr(self, "min_cooc_var", tk.IntVar(value=1)).get()
-        net_width = getattr(self, "net_width_var", tk.IntVar(value=1200)).get()
-        net_height = getattr(self, "net_height_var", tk.IntVar(value=800)).get()
-        cmap_name = getattr(self, "network_cmap_var", tk.StringVar(value="Pastel1")).get()
-        edge_cmap_name = getattr(self, "edge_cmap_var", tk.StringVar(value="Blues")).get()
-        node_size_scale = getattr(self, "node_size_scale_var", tk.DoubleVar(value=1.0)).get()
-        font_size_scale = getattr(self, "font_size_scale_var", tk.DoubleVar(value=1.0)).get()
-        show_legend = getattr(self, "show_legend_var", tk.BooleanVar(value=True)).get()
-        layout_mode = getattr(self, "layout_mode_var", tk.StringVar(value="kamada")).get()
-        spring_k = getattr(self, "spring_k_var", tk.DoubleVar(value=0.5)).get()
-        spring_iter = getattr(self, "spring_iter_var", tk.IntVar(value=200)).get()
-        spring_seed = getattr(self, "spring_seed_var", tk.IntVar(value=42)).get()
-
-        fig = self.visual_service.build_network_figure(
-            tokens,
-            word_freq,
-            self.pre_tokens_lines,
-            self.original_lines,
-            window_mode=window_mode,
-            window_size=window_size,
-            collapse_consecutive=collapse_consecutive,
-            dedup_pairs_per_line=dedup_pairs_per_line,
-            self_loop_mode=self_loop_mode,
-            edge_count=edge_count,
-            min_cooc=min_cooc,
-            net_width=net_width,
-            net_height=net_height,
-            cmap_name=cmap_name,
-            edge_cmap_name=edge_cmap_name,
-            node_size_scale=node_size_scale,
-            font_size_scale=font_size_scale,
-            show_legend=show_legend,
-            font_family=self.vis_font_family or None,
-            layout_mode=layout_mode,
-            spring_k=spring_k,
-            spring_iterations=spring_iter,
-            spring_seed=spring_seed,
-        )
+        edge_count = self.net_edge_count_var.get()
+        self_loop_mode = self.self_loop_var.get()
+        window_mode = self.window_mode_var.get()
+        collapse_consecutive = self.collapse_consecutive_var.get()
+        dedup_pairs_per_line = self.dedup_pairs_per_line_var.get()
+        min_cooc = self.min_cooc_var.get()
+        net_width = self.net_width_var.get()
+        net_height = self.net_height_var.get()
+        cmap_name = self.network_cmap_var.get()
+        edge_cmap_name = self.edge_cmap_var.get()
+        node_size_scale = self.node_size_scale_var.get()
+        font_size_scale = self.font_size_scale_var.get()
+        show_legend = self.show_legend_var.get()
+        layout_mode = self.layout_mode_var.get()
+        spring_k = self.spring_k_var.get()
+        spring_iter = self.spring_iter_var.get()
+        spring_seed = self.spring_seed_var.get()
+        # ワーカー実行中に差し替えられても影響しないよう、行データは呼び出し時点のものを渡す
+        pre_tokens_lines = list(self.pre_tokens_lines)
+        original_lines = list(self.original_lines)
+        # 編集エリアのトークン列なら、_update_frequency で作った id 配列をそのまま共起の集計に使う
+        if tokens is self.tokens:
+            token_ids, token_vocab = self._ids, list(self._vocab)
+        else:
+            token_ids = token_vocab = None
+        visual_service = self.visual_service
+
+        def compute():
+            return visual_service.compute_network(
+                tokens,
+                word_freq,
+                pre_tokens_lines,
+                original_lines,
+                window_mode=window_mode,
+                window_size=window_size,
+                collapse_consecutive=collapse_consecutive,
+                dedup_pairs_per_line=dedup_pairs_per_line,
+                self_loop_mode=self_loop_mode,
+                edge_count=edge_count,
+                min_cooc=min_cooc,
+                layout_mode=layout_mode,
+                spring_k=spring_k,
+                spring_iterations=spring_iter,
+                spring_seed=spring_seed,
+                token_ids=token_ids,
+                token_vocab=token_vocab,
+            )
 
-        if not fig:
-            ttk.Label(self.network_frame, text="表示できるネットワークがありません").pack(pady=20)
-            return
+        def show(layout):
+            draw(layout)
+            if on_shown:
+                on_shown()
 
-        canvas = FigureCanvasTkAgg(fig, self.network_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        def draw(layout):
+            fig, canvas = self._figure_canvas("network", self.network_frame)
+            if layout is None:
+                canvas.get_tk_widget().pack_forget()
+                ttk.Label(self.network_frame, text="表示できるネットワークがありません").pack(pady=20)
+                return
 
-        ttk.Button(self.network_frame, text="画像として保存",
-                   command=lambda: self.save_figure(fig, "network")).pack(pady=5)
-        ttk.Button(self.network_frame, text="SVGで保存",
-                   command=lambda: self.save_figure(fig, "network", fmt="svg")).pack(pady=5)
-    def generate_frequency_chart(self, word_freq):
-        for widget in self.freq_frame.winfo_children():
-            widget.destroy()
+            self.visual_service.draw_network(
+                layout,
+                word_freq,
+                net_width=net_width,
+                net_height=net_height,
+                cmap_name=cmap_name,
+                edge_cmap_name=edge_cmap_name,
+                node_size_scale=node_size_scale,
+                font_size_scale=font_size_scale,
+                show_legend=show_legend,
+                font_family=self.vis_font_family or None,
+                fig=fig,
+            )
+            canvas.draw_idle()
+
+            ttk.Button(self.network_frame, text="画像として保存",
+                       command=lambda: self.save_figure(fig, "network")).pack(pady=5)
+            ttk.Button(self.network_frame, text="SVGで保存",
+                       command=lambda: self.save_figure(fig, "network", fmt="svg")).pack(pady=5)
+
+        # 描画だけに使う設定はキーに含めない (show が毎回描き直す)
+        inputs = (
+            tuple(tokens), frozenset(word_freq.items()),
+            tuple(map(tuple, pre_tokens_lines)), tuple(original_lines),
+            window_mode, window_size, collapse_consecutive, dedup_pairs_per_line,
+            self_loop_mode, edge_count, min_cooc, layout_mode, spring_k, spring_iter, spring_seed,
+        )
+        self._run_cached("network", inputs, compute, show, "共起ネットワークの生成中に問題が発生しました")
 
-        fig = self.visual_service.build_frequency_figure(word_freq)
+    def generate_frequency_chart(self, word_freq):
+        fig, canvas = self._figure_canvas("frequency", self.freq_frame)
+        self.visual_service.build_frequency_figure(word_freq, fig=fig)
 
-        canvas = FigureCanvasTkAgg(fig, self.freq_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        canvas.draw_idle()
 
         # 保存ボタン群
         btn_frame = ttk.Frame(self.freq_frame)
@@ -1133,50 +1419,15 @@ class JapaneseTextAnalyzer:
 
     def on_generate_wordcloud(self):
         # 編集エリアから単語・頻度を取得し、最小出現回数でフィルタ
-        text = self.edit_area.get(1.0, tk.END).strip()
+        text = self._get_edit_text()
         if not text:
             messagebox.showwarning("警告", "単語データがありません。")
             return
         
         # 行ごと重複カウント制御オプションを確認
-        dedup_word_mode = getattr(self, "dedup_word_per_line_var", tk.BooleanVar(value=False)).get()
-        
-        if dedup_word_mode and self.original_lines:
-            # 共起ネットワークと同じロジック：pre_tokens_lines を優先的に使用
-            unique_tokens = []
-            if getattr(self, "pre_tokens_lines", None) and len(self.pre_tokens_lines) > 0:
-                # pre_tokens_lines がある場合（分かち書き後）
-                for surfaces in self.pre_tokens_lines:
-                    if not surfaces:
-                        continue
-                    # ストップワード除去・長さ条件を適用
-                    line_tokens = [s for s in surfaces if s not in self.stop_words and len(s) > 1]
-                    # 行内で重複排除
-                    seen = set()
-                    for t in line_tokens:
-                        if t not in seen:
-                            unique_tokens.append(t)
-                            seen.add(t)
-            else:
-                # フォールバック：original_lines から
-                for line in self.original_lines:
-                    if not line.strip():
-                        continue
-                    line_tokens = line.split()
-                    # 行内で重複排除
-                    seen = set()
-                    for t in line_tokens:
-                        if t not in seen:
-                            unique_tokens.append(t)
-                            seen.add(t)
-            word_freq = Counter(unique_tokens)
-        else:
-            # 行ごとカウント無効：単純に全トークンをカウント
-            tokens = text.split()
-            word_freq = Counter(tokens)
-        
+        dedup_word_mode = self.dedup_word_per_line_var.get()
+        _, filtered_freq = self._get_filtered(text, dedup_word_mode)
         min_freq = self.min_freq_var.get()
-        filtered_freq = {k: v for k, v in word_freq.items() if v >= min_freq}
         if not filtered_freq:
             messagebox.showwarning("警告", f"最小出現回数{min_freq}回以上の単語がありません。")
             return
@@ -1187,14 +1438,12 @@ class JapaneseTextAnalyzer:
             messagebox.showerror("エラー", f"WordCloud の生成中に問題が発生しました: {e}")
 
     def on_generate_network(self):
-        text = self.edit_area.get(1.0, tk.END).strip()
+        text = self._get_edit_text()
         if not text:
             messagebox.showwarning("警告", "単語データがありません。")
             return
-        tokens = text.split()
-        word_freq = Counter(tokens)
+        tokens, filtered_freq = self._get_filtered(text)
         min_freq = self.min_freq_var.get()
-        filtered_freq = {k: v for k, v in word_freq.items() if v >= min_freq}
         if not filtered_freq:
             messagebox.showwarning("警告", f"最小出現回数{min_freq}回以上の単語がありません。")
             return
@@ -1205,50 +1454,15 @@ class JapaneseTextAnalyzer:
             messagebox.showerror("エラー", f"共起ネットワークの生成中に問題が発生しました: {e}")
 
     def on_generate_frequency_chart(self):
-        text = self.edit_area.get(1.0, tk.END).strip()
+        text = self._get_edit_text()
         if not text:
             messagebox.showwarning("警告", "単語データがありません。")
             return
         
         # 行ごと重複カウント制御オプションを確認
-        dedup_word_mode = getattr(self, "dedup_word_per_line_var", tk.BooleanVar(value=False)).get()
-        
-        if dedup_word_mode and self.original_lines:
-            # 共起ネットワークと同じロジック：pre_tokens_lines を優先的に使用
-            unique_tokens = []
-            if getattr(self, "pre_tokens_lines", None) and len(self.pre_tokens_lines) > 0:
-                # pre_tokens_lines がある場合（分かち書き後）
-                for surfaces in self.pre_tokens_lines:
-                    if not surfaces:
-                        continue
-                    # ストップワード除去・長さ条件を適用
-                    line_tokens = [s for s in surfaces if s not in self.stop_words and len(s) > 1]
-                    # 行内で重複排除
-                    seen = set()
-                    for t in line_tokens:
-                        if t not in seen:
-                            unique_tokens.append(t)
-                            seen.add(t)
-            else:
-                # フォールバック：original_lines から
-                for line in self.original_lines:
-                    if not line.strip():
-                        continue
-                    line_tokens = line.split()
-                    # 行内で重複排除
-                    seen = set()
-                    for t in line_tokens:
-                        if t not in seen:
-                            unique_tokens.append(t)
-                            seen.add(t)
-            word_freq = Counter(unique_tokens)
-        else:
-            # 行ごとカウント無効：単純に全トークンをカウント
-            tokens = text.split()
-            word_freq = Counter(tokens)
-        
+        dedup_word_mode = self.dedup_word_per_line_var.get()
+        _, filtered_freq = self._get_filtered(text, dedup_word_mode)
         min_freq = self.min_freq_var.get()
-        filtered_freq = {k: v for k, v in word_freq.items() if v >= min_freq}
         if not filtered_freq:
             messagebox.showwarning("警告", f"最小出現回数{min_freq}回以上の単語がありません。")
             return
@@ -1282,146 +1496,60 @@ class JapaneseTextAnalyzer:
         except Exception as e:
             messagebox.showerror("エラー", f"保存に失敗しました: {e}")
 
-    def generate_frequency_chart(self, word_freq):
-        # 既存のウィジェットをクリア
-        for widget in self.freq_frame.winfo_children():
-            widget.destroy()
-
-        # 上位30単語
-        top_words = dict(sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:30])
-
-        # 描画
-        fig, ax = plt.subplots(figsize=(12, 8))
-        words = list(top_words.keys())
-        counts = list(top_words.values())
-
-        ax.barh(words, counts, color='steelblue')
-        ax.set_xlabel('出現回数', fontsize=12)
-        ax.set_title(f'単語出現頻度（全{len(word_freq)}単語中の上位30単語）', fontsize=16, pad=20)
-        ax.invert_yaxis()
-        plt.tight_layout()
-
-        canvas = FigureCanvasTkAgg(fig, self.freq_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-
-        # 保存ボタン群
-        btn_frame = ttk.Frame(self.freq_frame)
-        btn_frame.pack(pady=5)
-        ttk.Button(btn_frame, text="画像として保存",
-                   command=lambda: self.save_figure(fig, "frequency")).pack(side=tk.LEFT, padx=5)
-        
-        # CSV 出力ボタン
-        def export_frequency_csv():
-            filepath = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                initialfile="frequency.csv",
-                filetypes=[("CSVファイル", "*.csv"), ("すべてのファイル", "*.*")]
-            )
-            if not filepath:
-                return
-            try:
-                with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['単語', '出現回数'])
-                    for word, count in sorted(word_freq.items(), key=lambda x: x[1], reverse=True):
-                        writer.writerow([word, count])
-                messagebox.showinfo("完了", f"保存しました: {filepath}")
-            except Exception as e:
-                messagebox.showerror("エラー", f"保存に失敗しました: {e}")
-        
-        ttk.Button(btn_frame, text="CSV出力", command=export_frequency_csv).pack(side=tk.LEFT, padx=5)
-
     def show_cooccurrence_table(self):
         """共起ペアの頻度を可視化タブ内で表示（CSV出力可能）"""
         # clear previous contents
         for w in self.cooc_frame.winfo_children():
             w.destroy()
 
-        text = self.edit_area.get(1.0, tk.END).strip()
+        text = self._get_edit_text()
         if not text:
             ttk.Label(self.cooc_frame, text="単語データがありません。").pack(pady=10)
             return
 
-        tokens = text.split()
+        # 編集エリアの分割・集計は単語リストと共有のキャッシュを使う
+        self._update_frequency(text)
+        tokens = self.tokens
         if len(tokens) < 2:
             ttk.Label(self.cooc_frame, text="共起ペアを計算するには単語が2つ以上必要です。").pack(pady=10)
             return
 
-        word_freq = Counter(tokens)
         window_size = self.window_var.get()
-        window_mode = getattr(self, "window_mode_var", tk.StringVar(value="sliding")).get()
-        collapse = getattr(self, "collapse_consecutive_var", tk.BooleanVar(value=False)).get()
-
-        # ペア抽出（collapse を反映）
-        cooc_pairs = []
-        def maybe_collapse(seq):
-            return self._collapse_consecutive(seq) if collapse else seq
-
-        if window_mode == "sliding":
-            tokens_used = maybe_collapse(tokens)
-            for i in range(len(tokens_used)):
-                for j in range(i + 1, min(i + window_size, len(tokens_used))):
-                    pair = tuple(sorted([tokens_used[i], tokens_used[j]]))
-                    cooc_pairs.append(pair)
-        else:
-            # 行ごと形式：pre_tokens_lines を優先的に使い、行ごとに独立して抽出
-            dedup_mode = getattr(self, "dedup_pairs_per_line_var", tk.BooleanVar(value=False)).get()
-            
-            if getattr(self, "pre_tokens_lines", None) and len(self.pre_tokens_lines) > 0:
-                for surfaces in self.pre_tokens_lines:
-                    if not surfaces:
-                        continue
-                    # ストップワード除去・長さ条件を統一して適用
-                    line_tokens = [s for s in surfaces if s in word_freq]
-                    if collapse:
-                        line_tokens = self._collapse_consecutive(line_tokens)
-                    # この行内でのペア抽出（行間にまたがらない）
-                    seen_pairs_in_line = set() if dedup_mode else None
-                    for i in range(len(line_tokens)):
-                        for j in range(i + 1, len(line_tokens)):
-                            pair = tuple(sorted([line_tokens[i], line_tokens[j]]))
-                            if dedup_mode:
-                                if pair not in seen_pairs_in_line:
-                                    cooc_pairs.append(pair)
-                                    seen_pairs_in_line.add(pair)
-                            else:
-                                cooc_pairs.append(pair)
+        window_mode = self.window_mode_var.get()
+        collapse = self.collapse_consecutive_var.get()
+        min_cooc = self.min_cooc_var.get()
+
+        # ペア抽出（collapse を反映）: どちらの形式も語彙 id の配列上で数え、min共起 未満のペアは語の組に戻す前に落とす
+        # （語の並びは文字列順の語彙 id で正規化）
+        vocab, word_ids = CooccurrenceService.build_vocab(self._vocab)
+        # 行ごと形式は pre_tokens_lines を優先し、行ごとに独立して抽出する（窓内形式では重複除去しない）
+        dedup_mode = window_mode != "sliding" and self.dedup_pairs_per_line_var.get()
+        cooc_count = CooccurrenceService.count_pairs(
+            window_mode, vocab, word_ids, window_size, dedup_mode, collapse,
+            token_ids=self._ids, token_vocab=self._vocab,
+            pre_tokens_lines=self.pre_tokens_lines, original_lines=self.original_lines,
+            min_count=min_cooc,
+        )
+
+        if not cooc_count:
+            # 集計時に min共起 で絞り込み済みなので、空なら条件を満たすペアがないことを示す
+            if min_cooc > 1:
+                message = f"min共起={min_cooc} を満たすペアがありません。"
             else:
-                # フォールバック：original_lines から
-                for line in self.original_lines:
-                    if not line.strip():
-                        continue
-                    line_tokens = line.split()
-                    if collapse:
-                        line_tokens = self._collapse_consecutive(line_tokens)
-                    # この行内でのペア抽出（行間にまたがらない）
-                    seen_pairs_in_line = set() if dedup_mode else None
-                    for i in range(len(line_tokens)):
-                        for j in range(i + 1, len(line_tokens)):
-                            pair = tuple(sorted([line_tokens[i], line_tokens[j]]))
-                            if dedup_mode:
-                                if pair not in seen_pairs_in_line:
-                                    cooc_pairs.append(pair)
-                                    seen_pairs_in_line.add(pair)
-                            else:
-                                cooc_pairs.append(pair)
-
-        if not cooc_pairs:
-            ttk.Label(self.cooc_frame, text="共起ペアが見つかりません。").pack(pady=10)
+                message = "共起ペアが見つかりません。"
+            ttk.Label(self.cooc_frame, text=message).pack(pady=10)
             return
 
-        cooc_count = Counter(cooc_pairs)
-
-        # 最小共起回数フィルタ
-        min_cooc = getattr(self, "min_cooc_var", tk.IntVar(value=1)).get()
-        items = [(p[0], p[1], c) for p, c in cooc_count.items() if c >= min_cooc]
-        if not items:
-            ttk.Label(self.cooc_frame, text=f"min共起={min_cooc} を満たすペアがありません。").pack(pady=10)
-            return
+        # 頻度順に1回だけ並べ替える（同数は集計順のまま）
+        items = [(p[0], p[1], c) for p, c in cooc_count.items()]
+        items.sort(key=lambda x: x[2], reverse=True)
 
         # ヘッダー
-        ttk.Label(self.cooc_frame, text=f"共起ペア一覧（min共起={min_cooc}、全{len(items)}件）", font=("", 12, "bold")).pack(pady=8)
+        shown = items[:_COOC_TABLE_MAX_ROWS]
+        header = f"共起ペア一覧（min共起={min_cooc}、全{len(items)}件"
+        if len(shown) < len(items):
+            header += f"、上位{len(shown)}件を表示"
+        ttk.Label(self.cooc_frame, text=header + "）", font=("", 12, "bold")).pack(pady=8)
 
         # Treeview 表示
         tree_frame = ttk.Frame(self.cooc_frame)
@@ -1442,9 +1570,9 @@ class JapaneseTextAnalyzer:
             tree.heading(col, text=col)
             tree.column(col, width=150 if col != "共起回数" else 90, anchor=(tk.CENTER if col=="共起回数" else tk.W))
 
-        # データ挿入（頻度順）
-        for word1, word2, count in sorted(items, key=lambda x: x[2], reverse=True):
-            tree.insert('', tk.END, values=(word1, word2, count))
+        # データ挿入（頻度順）: 行ごとに Tk の呼び出しが発生するため、表示は上位の行に限る
+        for row in shown:
+            tree.insert('', tk.END, values=row)
 
         # CSV保存
         def export_csv_from_tab():
@@ -1461,8 +1589,8 @@ class JapaneseTextAnalyzer:
                 with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
                     writer = csv.writer(f)
                     writer.writerow(columns)
-                    for word1, word2, count in sorted(items, key=lambda x: x[2], reverse=True):
-                        writer.writerow([word1, word2, count])
+                    # items は表示時に頻度順へ並べ替え済み
+                    writer.writerows(items)
                 messagebox.showinfo("完了", f"保存しました: {filepath}")
             except Exception as e:
                 messagebox.showerror("エラー", f"保存に失敗しました: {e}")
@@ -1494,10 +1622,12 @@ class JapaneseTextAnalyzer:
                 self.pre_token_area.delete(1.0, tk.END)
             return
 
-        lines = text.split('\n')
-        for raw_line in lines:
-            surfaces, _ = self.token_service.parse_with_pos(raw_line) if self.token_service else ([], [])
-            self.pre_tokens_lines.append(surfaces if surfaces else [])
+        if self.token_service:
+            self.pre_tokens_lines = [list(line) for line in self.token_service.split_text(text)]
+            # 同じ解析で得た品詞を控えておき、編集領域の語の品詞を引き直さずに済ませる
+            self._surface_to_pos.update(self.token_service.split_text_pos(text))
+        else:
+            self.pre_tokens_lines = [[] for _ in text.split('\n')]
 
         # 表示を更新
         self.show_pre_tokenized()
@@ -1509,11 +1639,10 @@ class JapaneseTextAnalyzer:
         if not hasattr(self, "pre_token_area"):
             return
         self.pre_token_area.delete(1.0, tk.END)
-        for line_tokens in self.pre_tokens_lines:
-            if line_tokens:
-                self.pre_token_area.insert(tk.END, " ".join(line_tokens) + "\n")
-            else:
-                self.pre_token_area.insert(tk.END, "\n")
+        # 行ごとに insert すると Tk の呼び出しが行数ぶん発生するため、全行を連結して1回で挿入する
+        self.pre_token_area.insert(
+            tk.END, "".join(" ".join(line_tokens) + "\n" for line_tokens in self.pre_tokens_lines)
+        )
 
     def add_merge_rule(self):
         """ルールを追加（語数チェック・重複チェックあり）"""
@@ -1527,11 +1656,12 @@ class JapaneseTextAnalyzer:
             messagebox.showwarning("警告", f"指定した語数が一致しません（期待: {n}語）。")
             return
         merged = self.merge_to_entry.get().strip() or "".join(seq)
-        rule = {"len": n, "seq": seq, "merged": merged}
-        if any(r["seq"] == seq for r in self.merge_rules):
+        if seq in self.merge_rules:
             messagebox.showwarning("警告", "同じ語列のルールが既に存在します。")
             return
-        self.merge_rules.append(rule)
+        self.merge_rules[seq] = merged
+        self._merge_rule_keys.append(seq)
+        self._merge_trie = None
         self.merge_rule_listbox.insert(tk.END, f'{n}語: {" ".join(seq)} → {merged}')
         # 入力クリア
         self.merge_seq_entry.delete(0, tk.END)
@@ -1543,21 +1673,29 @@ class JapaneseTextAnalyzer:
             return
         i = idx[0]
         self.merge_rule_listbox.delete(i)
-        del self.merge_rules[i]
+        del self.merge_rules[self._merge_rule_keys.pop(i)]
+        self._merge_trie = None
+
+    def _get_merge_trie(self):
+        """merge_rules のトライ木を返す（ルールが変わるまで作り直さない）"""
+        if self._merge_trie is None:
+            self._merge_trie = TokenizationService.compile_merge_rules(self.merge_rules)
+        return self._merge_trie
 
     def apply_rules_to_tokens(self, tokens_line):
         """与えられたトークン行に対して merge_rules を適用して新しいトークン行を返す（長いルール優先）"""
         if not tokens_line:
             return []
-        return TokenizationService.apply_merge_rules_to_line(tokens_line, self.merge_rules)
+        return TokenizationService.apply_merge_trie(tokens_line, self._get_merge_trie())
 
     def apply_merge_rules_preview(self):
         """pre_tokens_lines に対してルールを適用した結果をプレビュー表示"""
         if not hasattr(self, "pre_tokens_lines") or not self.pre_tokens_lines:
             self.update_pre_tokens()
         preview_lines = []
+        trie = self._get_merge_trie()
         for tokens_line in self.pre_tokens_lines:
-            new_line = self.apply_rules_to_tokens(tokens_line) if self.merge_rules else tokens_line
+            new_line = TokenizationService.apply_merge_trie(tokens_line, trie) if self.merge_rules else tokens_line
             preview_lines.append(" ".join(new_line))
         if hasattr(self, "merge_preview_area"):
             self.merge_preview_area.delete(1.0, tk.END)
@@ -1574,7 +1712,7 @@ class JapaneseTextAnalyzer:
         # --- 変更: 編集領域を更新する前に Listbox と同期して最新の stop_words を反映 ---
         if hasattr(self, "stopword_listbox"):
             try:
-                self.stop_words = set(self.stopword_listbox.get(0, tk.END))
+                self.stop_words = set(map(sys.intern, self.stopword_listbox.get(0, tk.END)))
             except Exception:
                 # 万一の取得エラーは既存の self.stop_words を維持
                 pass
@@ -1584,26 +1722,28 @@ class JapaneseTextAnalyzer:
             self.pre_tokens_lines,
             self.merge_rules,
             self.stop_words,
+            trie=self._get_merge_trie(),
         )
         self.pre_tokens_lines = merged_lines
 
         # フィルタ済みトークンが空の場合は安全側で長さ1も残す
+        stops = self.stop_words
         merged_tokens_all = (
             filtered_tokens
             if filtered_tokens
-            else [t for line in merged_lines for t in line if t not in self.stop_words and len(t) > 0]
+            else [t for line in merged_lines for t in line if t not in stops and len(t) > 0]
         )
 
         # original_lines も結合後の内容に合わせて更新（行単位の表示や共起計算で利用）
+        # 各行のフィルタは1回だけ行い、空になった行を除く
         self.original_lines = [
-            " ".join([t for t in line if t not in self.stop_words and len(t) > 1])
-            for line in merged_lines
-            if any(t for t in line if t not in self.stop_words and len(t) > 1)
+            " ".join(kept)
+            for kept in ([t for t in line if t not in stops and len(t) > 1] for line in merged_lines)
+            if kept
         ]
 
         # 編集エリアへ反映
-        self.edit_area.delete(1.0, tk.END)
-        self.edit_area.insert(tk.END, " ".join(merged_tokens_all))
+        self._set_edit_text(" ".join(merged_tokens_all))
         self.refresh_word_list()
         messagebox.showinfo("完了", "結合ルールを適用し、編集領域を更新しました。")
     # --- 追加メソッドここまで ---
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+from collections import Counter
+from itertools import chain, repeat
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class CooccurrenceService:
+    """Co-occurrence pair counting on integer word ids, without GUI coupling."""
+
+    @staticmethod
+    def build_vocab(words: Iterable[str]) -> Tuple[List[str], dict]:
+        """語彙を文字列順に並べて id を振る（id の大小が語の大小と一致する）。"""
+        vocab = sorted(set(words))
+        return vocab, {w: i for i, w in enumerate(vocab)}
+
+    @staticmethod
+    def _pairs_to_counter(
+        keys: np.ndarray,
+        weights: np.ndarray | None,
+        vocab: Sequence[str],
+        min_count: int = 1,
+        top_n: int | None = None,
+    ) -> Counter:
+        """lo * len(vocab) + hi で詰めたペアキーを集計し、(語1, 語2) の Counter に戻す。
+
+        min_count 未満のペアは文字列に戻す前に配列上で落とす。top_n を指定すると、
+        Counter.most_common(top_n) と同じ順位（同数はキー順）の上位 top_n 件だけを文字列に戻す。
+        """
+        if len(keys) == 0:
+            return Counter()
+        n_vocab = len(vocab)
+        if weights is None:
+            uniq_keys, totals = np.unique(keys, return_counts=True)
+        else:
+            uniq_keys, inverse = np.unique(keys, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights).astype(np.int64)
+        if min_count > 1:
+            keep = totals >= min_count
+            uniq_keys, totals = uniq_keys[keep], totals[keep]
+        if top_n is not None and top_n < len(uniq_keys):
+            # 語の組に戻すタプル生成がいちばん重いので、使われる上位だけを残す（安定ソートで同数はキー順）
+            order = np.argsort(-totals, kind="stable")[:max(top_n, 0)]
+            uniq_keys, totals = uniq_keys[order], totals[order]
+        lo, hi = np.divmod(uniq_keys, n_vocab)
+        return Counter(
+            {(vocab[a], vocab[b]): int(c) for a, b, c in zip(lo.tolist(), hi.tolist(), totals.tolist())}
+        )
+
+    @staticmethod
+    def count_sliding_pairs(
+        tokens: Sequence[str],
+        vocab: Sequence[str],
+        word_ids: dict,
+        window_size: int,
+        dedup_pairs_per_window: bool,
+        min_count: int = 1,
+        top_n: int | None = None,
+    ) -> Counter:
+        """スライディング窓で各トークンと後続 window_size-1 個以内の語とのペアを数える。"""
+        # 語彙の判定は語ごとに辞書を1回引くだけにし、以降の窓の走査は id 配列だけで行う
+        all_ids = np.fromiter(map(word_ids.get, tokens, repeat(-1)), dtype=np.int64, count=len(tokens))
+        return CooccurrenceService.count_sliding_pair_ids(
+            all_ids, vocab, window_size, dedup_pairs_per_window, min_count, top_n
+        )
+
+    @staticmethod
+    def remap_ids(token_ids: np.ndarray, token_vocab: Sequence[str], word_ids: dict) -> np.ndarray:
+        """別の語彙で振った id 列を word_ids の id 列に付け替える（語彙外は -1）。
+
+        辞書を引くのは語彙ごとに1回だけで、トークン列の変換は配列の添字参照で済ませる。
+        """
+        table = np.fromiter((word_ids.get(w, -1) for w in token_vocab), dtype=np.int64, count=len(token_vocab))
+        return table[token_ids]
+
+    @staticmethod
+    def count_sliding_pair_ids(
+        all_ids: np.ndarray,
+        vocab: Sequence[str],
+        window_size: int,
+        dedup_pairs_per_window: bool,
+        min_count: int = 1,
+        top_n: int | None = None,
+    ) -> Counter:
+        """count_sliding_pairs の本体。トークン列は vocab の id（語彙外は -1）の配列で受け取る。
+
+        語彙に含まれる語の出現位置と id だけを配列に残し、窓内の k 個先の語との組を
+        k ごとにまとめて NumPy で取り出す（Python の二重ループを使わない）。
+        """
+        n_vocab = len(vocab)
+        positions = np.flatnonzero(all_ids >= 0)
+        ids = all_ids[positions]
+
+        anchor_parts: List[np.ndarray] = []
+        partner_parts: List[np.ndarray] = []
+        for k in range(1, window_size):
+            if k >= len(positions):
+                break
+            # 語彙内で k 個先の語が窓に収まるアンカー（k が増えるほど間隔は広がる）
+            anchors = np.flatnonzero(positions[k:] - positions[:-k] < window_size)
+            if len(anchors) == 0:
+                break
+            anchor_parts.append(anchors)
+            partner_parts.append(ids[anchors + k])
+
+        if not anchor_parts:
+            return Counter()
+        anchors = np.concatenate(anchor_parts)
+        partners = np.concatenate(partner_parts)
+        if dedup_pairs_per_window:
+            # 同じアンカーの窓内で同じ相手語は1回のみ
+            anchors, partners = np.divmod(np.unique(anchors * n_vocab + partners), n_vocab)
+
+        a = ids[anchors]
+        keys = np.minimum(a, partners) * n_vocab + np.maximum(a, partners)
+        return CooccurrenceService._pairs_to_counter(keys, None, vocab, min_count, top_n)
+
+    @staticmethod
+    def count_line_pairs(
+        lines: Iterable[Sequence[str]],
+        vocab: Sequence[str],
+        word_ids: dict,
+        dedup_pairs_per_line: bool,
+        min_count: int = 1,
+        top_n: int | None = None,
+        collapse_consecutive: bool = False,
+    ) -> Counter:
+        """行ごとの全ペアを数える（行×語彙の出現行列 X に対する X.T @ X の上三角に相当）。
+
+        dedup_pairs_per_line が True なら同じ行内の同じペアは1回のみ数える。
+        collapse_consecutive が True なら、語彙外の語を除いたうえで行内で連続する同じ語を1つにまとめる。
+        戻り値のキーは (語1, 語2) で、語1 <= 語2 に正規化されている。
+        全行のトークンを (行番号, 語 id) の平らな配列にまとめ、行ごとの Python ループなしに
+        NumPy だけでペアを展開する。
+        """
+        n_vocab = len(vocab)
+        lines = [line for line in lines if len(line) > 1]
+        if not lines:
+            return Counter()
+        flat = list(chain.from_iterable(lines))
+        all_ids = np.fromiter(map(word_ids.get, flat, repeat(-1)), dtype=np.int64, count=len(flat))
+        line_no = np.repeat(np.arange(len(lines), dtype=np.int64), [len(line) for line in lines])
+        in_vocab = all_ids >= 0
+        if not in_vocab.any():
+            return Counter()
+
+        line_no, all_ids = line_no[in_vocab], all_ids[in_vocab]
+        if collapse_consecutive:
+            keep = np.empty(len(all_ids), dtype=bool)
+            keep[0] = True
+            keep[1:] = (all_ids[1:] != all_ids[:-1]) | (line_no[1:] != line_no[:-1])
+            line_no, all_ids = line_no[keep], all_ids[keep]
+
+        # 行内の語ごとの出現回数（行番号→語 id の順に並ぶ）
+        uniq, counts = np.unique(line_no * n_vocab + all_ids, return_counts=True)
+        rows, ids = np.divmod(uniq, n_vocab)
+
+        key_parts: List[np.ndarray] = []
+        weight_parts: List[np.ndarray] = []
+
+        # 異なる語のペア: 同じ行の中で自分より後ろ（id が大きい）の語すべてと組にする
+        n = len(ids)
+        group_end = np.searchsorted(rows, rows, side="right")
+        n_after = group_end - np.arange(n)
+        n_after -= 1
+        total = int(n_after.sum())
+        if total:
+            left = np.repeat(np.arange(n), n_after)
+            starts = np.cumsum(n_after) - n_after
+            right = left + (np.arange(total) - np.repeat(starts, n_after)) + 1
+            key_parts.append(ids[left] * n_vocab + ids[right])
+            if dedup_pairs_per_line:
+                weight_parts.append(np.ones(total, dtype=np.int64))
+            else:
+                # 非重複モードでは出現回数の積
+                weight_parts.append(counts[left] * counts[right])
+
+        # 同じ語どうしのペア（自己ループ）: 2回以上出現した語のみ
+        repeated = counts >= 2
+        if repeated.any():
+            key_parts.append(ids[repeated] * (n_vocab + 1))
+            if dedup_pairs_per_line:
+                weight_parts.append(np.ones(int(repeated.sum()), dtype=np.int64))
+            else:
+                c = counts[repeated]
+                weight_parts.append(c * (c - 1) // 2)
+
+        if not key_parts:
+            return Counter()
+        return CooccurrenceService._pairs_to_counter(
+            np.concatenate(key_parts), np.concatenate(weight_parts), vocab, min_count, top_n
+        )
+
+    @staticmethod
+    def collapse_consecutive(seq: Iterable[str]) -> List[str]:
+        """連続する同じ語を1つにまとめる。"""
+        result: List[str] = []
+        prev = None
+        for item in seq:
+            if item != prev:
+                result.append(item)
+            prev = item
+        return result
+
+    @staticmethod
+    def count_pairs(
+        window_mode: str,
+        vocab: Sequence[str],
+        word_ids: dict,
+        window_size: int,
+        dedup_pairs: bool,
+        collapse_consecutive: bool,
+        tokens: Sequence[str] = (),
+        token_ids: np.ndarray | None = None,
+        token_vocab: Sequence[str] | None = None,
+        pre_tokens_lines: Sequence[Sequence[str]] | None = None,
+        original_lines: Sequence[str] = (),
+        min_count: int = 1,
+        top_n: int | None = None,
+    ) -> Counter:
+        """共起ネットワークと共起ペア一覧に共通の入口。window_mode に応じて窓内／行ごとのペアを数える。
+
+        "sliding" では token_ids / token_vocab（tokens を token_vocab の添字で表した配列）があれば
+        トークン文字列を引き直さずにその id 列から、なければ tokens から数える。
+        それ以外の行ごとモードでは pre_tokens_lines を優先し、なければ original_lines の各行を使う。
+        """
+        if window_mode == "sliding":
+            if token_ids is None or token_vocab is None:
+                tokens_used = CooccurrenceService.collapse_consecutive(tokens) if collapse_consecutive else tokens
+                return CooccurrenceService.count_sliding_pairs(
+                    tokens_used, vocab, word_ids, window_size, dedup_pairs, min_count, top_n
+                )
+            ids = np.asarray(token_ids)
+            if collapse_consecutive and len(ids):
+                ids = ids[np.r_[True, ids[1:] != ids[:-1]]]
+            return CooccurrenceService.count_sliding_pair_ids(
+                CooccurrenceService.remap_ids(ids, token_vocab, word_ids),
+                vocab, window_size, dedup_pairs, min_count, top_n,
+            )
+
+        if pre_tokens_lines:
+            # 語彙外の語の除去と連続する同じ語のまとめは、集計側で id 配列に対して行う
+            line_iter = (surfaces for surfaces in pre_tokens_lines if surfaces)
+            collapse_in_vocab = collapse_consecutive
+        else:
+            line_iter = (
+                CooccurrenceService.collapse_consecutive(line.split()) if collapse_consecutive else line.split()
+                for line in original_lines
+                if line.strip()
+            )
+            collapse_in_vocab = False
+        return CooccurrenceService.count_line_pairs(
+            line_iter,
+            vocab,
+            word_ids,
+            dedup_pairs,
+            min_count=min_count,
+            top_n=top_n,
+            collapse_consecutive=collapse_in_vocab,
+        )
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+import codecs
 import csv
 import io
 from dataclasses import dataclass
+from operator import itemgetter
 from pathlib import Path
 from typing import List, Optional, Sequence
 
+try:
+    from charset_normalizer import from_bytes  # optional: どの候補でもデコードできないファイルの推定に使う
+except ImportError:
+    from_bytes = None
+
 
 @dataclass
 class CsvDetectionResult:
@@ -18,6 +25,9 @@ class CsvDetectionResult:
 class FileService:
     """File-related helpers extracted from the GUI class."""
 
+    # エンコーディング判定に使う先頭バイト数
+    DETECT_SAMPLE_BYTES = 64 * 1024
+
     def detect_csv_content(self, filepath: str) -> CsvDetectionResult:
         raw = Path(filepath).read_bytes()
 
@@ -35,17 +45,24 @@ class FileService:
         used_enc: Optional[str] = None
         for enc in enc_candidates:
             try:
-                decoded = raw.decode(enc)
+                decoded = self._decode_in_chunks(raw, enc)
                 used_enc = enc
                 break
             except Exception:
                 continue
 
+        if decoded is None and from_bytes is not None:
+            best = from_bytes(raw).best()
+            if best is not None:
+                decoded = str(best)
+                used_enc = best.encoding
+
         if decoded is None:
             decoded = raw.decode("utf-8", errors="replace")
             used_enc = "utf-8 (replace)"
 
-        decoded = decoded.replace("\r\n", "\n").replace("\r", "\n")
+        if "\r" in decoded:
+            decoded = decoded.replace("\r\n", "\n").replace("\r", "\n")
         sample = decoded[:4096]
         delimiter = ","
         dialect = None
@@ -80,14 +97,39 @@ class FileService:
             has_header_guess=has_header_guess,
         )
 
+    @classmethod
+    def _decode_in_chunks(cls, raw: bytes, encoding: str) -> str:
+        """raw を DETECT_SAMPLE_BYTES ずつ逐次デコードする。
+
+        合わない候補は不正なバイトに当たった時点で UnicodeDecodeError になるので、先頭で外れる候補は
+        先頭だけ、途中で外れる候補もそこまでしかデコードしない。採用する候補は1回の走査で全体が得られる。
+        """
+        decoder = codecs.getincrementaldecoder(encoding)()
+        step = cls.DETECT_SAMPLE_BYTES
+        parts = [decoder.decode(raw[start:start + step]) for start in range(0, len(raw), step)]
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+
     @staticmethod
     def combine_columns(rows: Sequence[Sequence[str]], selected_indices: Sequence[int], has_header: bool) -> str:
+        """選択列をスペースで結合して1行にする（前後の空白と空セルは除くが、CSV の1行は必ず1行として残す）"""
         if not rows:
             return ""
 
         data_start = 1 if has_header else 0
-        lines: List[str] = []
-        for row in rows[data_start:]:
-            parts = [row[i] for i in selected_indices if i < len(row)]
-            lines.append(" ".join(parts))
-        return "\n".join(lines)
+        indices = tuple(selected_indices)
+        if not indices:
+            return "\n".join("" for _ in rows[data_start:])
+        need = max(indices) + 1
+        # 列が揃っている行は itemgetter で一括取り出しし、短い行だけ範囲チェックする
+        if len(indices) == 1:
+            only = indices[0]
+            getter = lambda row: (row[only],)  # noqa: E731
+        else:
+            getter = itemgetter(*indices)
+
+        def join_row(row: Sequence[str]) -> str:
+            cells = getter(row) if len(row) >= need else [row[i] for i in indices if i < len(row)]
+            return " ".join([v for v in map(str.strip, cells) if v])
+
+        return "\n".join(map(join_row, rows[data_start:]))
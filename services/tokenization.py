@@ -1,11 +1,39 @@
 from __future__ import annotations
 
+import os
+import re
+import sys
+import threading
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Iterable, List, Sequence, Tuple
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
 import sudachipy  # SudachiPy (Apache-2.0); uses sudachi-dictionary-full with IPA data (BSD notice should ship on redistribution)
 
+# 文字・数字（かな・漢字を含む）を1文字も含まない行は解析しても語が出ない
+_WORD_CHAR_RE = re.compile(r"\w")
+
+# 連語ルール: {語列タプル: 結合語} の辞書、または {"len": n, "seq": 語列タプル, "merged": 結合語} のリスト
+MergeRules = Union[Mapping[Tuple[str, ...], str], Sequence[dict]]
+
+# 解析で使うのは表層形と品詞だけなので、tokenizer には品詞以外の語情報（読み・正規化形など）を読ませない
+SUDACHI_FIELDS = ("pos",)
+
+
+@lru_cache(maxsize=1)
+def _load_sudachi_dictionary():
+    """Sudachi の辞書を読み込む。辞書の読み込みは tokenizer の生成よりはるかに重いため、プロセス内で1回だけ行う。"""
+    return sudachipy.Dictionary(sudachipy.Config())
+
+
+def create_sudachi_tokenizer_factory() -> Callable[[], object]:
+    """品詞のみを読み込む Sudachi tokenizer を作る factory を返す（同じ辞書から何度でも作れる）。"""
+    dictionary = _load_sudachi_dictionary()
+    # Dictionary.create は fields に set 型しか受け付けない
+    return partial(dictionary.create, fields=set(SUDACHI_FIELDS))
+
 
 @dataclass
 class TokenizationResult:
@@ -16,46 +44,171 @@ class TokenizationResult:
     original_lines: List[str]
     surfaces: List[str]
     pos_list: List[str]
+    surface_to_pos: Dict[str, str]
 
 
 class TokenizationService:
     """Utility wrapper around Sudachi tokenization logic without GUI side effects."""
 
-    def __init__(self, tokenizer=None):
+    # 解析対象の行がこの数以上あるときだけ、スレッドごとの tokenizer で並列に解析する
+    PARALLEL_MIN_LINES = 256
+
+    def __init__(
+        self,
+        tokenizer=None,
+        tokenizer_factory: Optional[Callable[[], object]] = None,
+        max_workers: Optional[int] = None,
+    ):
         if tokenizer is None:
-            config = sudachipy.Config()
-            dictionary = sudachipy.Dictionary(config)
-            self.tokenizer = dictionary.create()
+            default_factory = create_sudachi_tokenizer_factory()
+            self.tokenizer = default_factory()
+            tokenizer_factory = tokenizer_factory or default_factory
         else:
             self.tokenizer = tokenizer
+        self._parse_line_cached = lru_cache(maxsize=4096)(self._parse_line)
+        self._split_text_cached = lru_cache(maxsize=8)(self._split_text)
+
+        # Sudachi の tokenizer はスレッド間で共有できないため、ワーカースレッドには factory で個別に作る
+        self._tokenizer_factory = tokenizer_factory
+        self._max_workers = max_workers if max_workers is not None else min(4, os.cpu_count() or 1)
+        self._owner_thread = threading.get_ident()
+        self._thread_local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _current_tokenizer(self):
+        """呼び出し元スレッド用の tokenizer を返す（生成したスレッド以外では factory で作ったものを使う）"""
+        if self._tokenizer_factory is None or threading.get_ident() == self._owner_thread:
+            return self.tokenizer
+        tokenizer = getattr(self._thread_local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = self._thread_local.tokenizer = self._tokenizer_factory()
+        return tokenizer
 
     def parse_with_pos(self, text: str) -> Tuple[List[str], List[str]]:
-        tokens = self.tokenizer.tokenize(text)
-        surfaces, pos_list = [], []
-        for token in tokens:
-            surfaces.append(token.surface())
-            pos_list.append(token.part_of_speech()[0])
+        # MorphemeList は添字アクセスのたびに Morpheme を生成するため、一度だけ list 化して2回走査する
+        morphemes = list(self._current_tokenizer().tokenize(text))
+        # 同じ語を同一オブジェクトにそろえ、後段の dict / set 照合を参照比較で済ませる
+        surfaces = [sys.intern(m.surface()) for m in morphemes]
+        pos_list = [m.part_of_speech()[0] for m in morphemes]
         return surfaces, pos_list
 
+    def _parse_line(self, line: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        surfaces, pos_list = self.parse_with_pos(line)
+        return tuple(surfaces), tuple(pos_list)
+
+    def parse_line(self, line: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """1行分の解析結果を返す。同じ行の再解析を避けるため行文字列をキーにキャッシュする。"""
+        return self._parse_line_cached(line)
+
+    def clear_cache(self) -> None:
+        """tokenizer を差し替えたときなどに行単位の解析キャッシュを破棄する。"""
+        self._parse_line_cached.cache_clear()
+        self._split_text_cached.cache_clear()
+
+    def _parse_lines_parallel(self, lines: Sequence[str]) -> Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+        """行数が多いときは重複を除いた行をワーカースレッドで解析し、行 -> 解析結果の辞書を返す。
+
+        並列化しない場合は空の辞書を返し、呼び出し側は parse_line で逐次解析する。
+        """
+        if self._tokenizer_factory is None or self._max_workers < 2:
+            return {}
+        pending = [line for line in dict.fromkeys(lines) if _WORD_CHAR_RE.search(line)]
+        if len(pending) < self.PARALLEL_MIN_LINES:
+            return {}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        chunksize = max(1, len(pending) // (self._max_workers * 4))
+        return dict(zip(pending, self._executor.map(self.parse_line, pending, chunksize=chunksize)))
+
+    def split_lines(
+        self, lines: Sequence[str], surface_to_pos: Optional[Dict[str, str]] = None
+    ) -> List[List[str]]:
+        """各行を分かち書きした表層形のリストを返す（ストップワード除去前）。
+
+        tokenize_text と同じく、重複行はまとめて（行数が多ければ並列に）解析し、
+        語を含まない行は解析せず空リストにする。surface_to_pos を渡すと、同じ解析で得た
+        表層形 -> 品詞をそこに書き込む。
+        """
+        parsed = self._parse_lines_parallel(lines)
+        out: List[List[str]] = []
+        for raw_line in lines:
+            if not _WORD_CHAR_RE.search(raw_line):
+                out.append([])
+                continue
+            line_surfaces, line_pos = parsed.get(raw_line) or self.parse_line(raw_line)
+            out.append(list(line_surfaces))
+            if surface_to_pos is not None:
+                surface_to_pos.update(zip(line_surfaces, line_pos))
+        return out
+
+    def _split_text(self, text: str) -> Tuple[Tuple[Tuple[str, ...], ...], Dict[str, str]]:
+        surface_to_pos: Dict[str, str] = {}
+        lines = self.split_lines(text.split("\n"), surface_to_pos)
+        return tuple(map(tuple, lines)), surface_to_pos
+
+    def split_text(self, text: str) -> Tuple[Tuple[str, ...], ...]:
+        """テキスト全体の行ごとの分かち書きを返す。
+
+        連語ルールの試行などで同じテキストを繰り返し再解析しないよう、テキストをキーにキャッシュする。
+        ストップワードや連語ルールは解析結果に影響しないため、それらの変更ではキャッシュを破棄しない。
+        """
+        return self._split_text_cached(text)[0]
+
+    def split_text_pos(self, text: str) -> Dict[str, str]:
+        """split_text と同じ解析で得た表層形 -> 品詞の辞書を返す（呼び出し側で書き換えないこと）。"""
+        return self._split_text_cached(text)[1]
+
+    def pos_of(self, word: str) -> str:
+        """1語の品詞（大分類）を返す。行単位の解析キャッシュを共有するので、同じ語は1回しか解析しない。"""
+        if not word:
+            return ""
+        _, pos_list = self.parse_line(word)
+        return pos_list[0] if pos_list else ""
+
+    def pos_of_many(self, words: Sequence[str]) -> List[str]:
+        """複数語の品詞をまとめて引く。語が多ければ pos_of の解析を行単位と同じくワーカースレッドで並列に行う。"""
+        parsed = self._parse_lines_parallel(words)
+        out: List[str] = []
+        for word in words:
+            if not word:
+                out.append("")
+                continue
+            _, pos_list = parsed.get(word) or self.parse_line(word)
+            out.append(pos_list[0] if pos_list else "")
+        return out
+
     def tokenize_text(self, text: str, stop_words: Iterable[str]) -> TokenizationResult:
         stop_set = set(stop_words)
         lines = text.split("\n")
+        parsed = self._parse_lines_parallel(lines)
 
+        # 行ごとにキャッシュ付きで解析し、ストップワード除去も同じ走査の中で行う
         pre_tokens_lines: List[List[str]] = []
-        for raw_line in lines:
-            surfaces, _ = self.parse_with_pos(raw_line)
-            pre_tokens_lines.append(surfaces)
-
         original_lines: List[str] = []
-        for surfaces in pre_tokens_lines:
-            line_tokens = [s for s in surfaces if s not in stop_set and len(s) > 1]
+        surfaces: List[str] = []
+        pos_list: List[str] = []
+        tokens: List[str] = []
+        pos_cache: List[str] = []
+        for raw_line in lines:
+            # 空行・空白のみ・記号のみの行は解析せず、行の対応だけ保つ
+            if not _WORD_CHAR_RE.search(raw_line):
+                pre_tokens_lines.append([])
+                continue
+            line_surfaces, line_pos = parsed.get(raw_line) or self.parse_line(raw_line)
+            pre_tokens_lines.append(list(line_surfaces))
+            surfaces.extend(line_surfaces)
+            pos_list.extend(line_pos)
+            line_tokens: List[str] = []
+            for surface, pos in zip(line_surfaces, line_pos):
+                if surface not in stop_set and len(surface) > 1:
+                    line_tokens.append(surface)
+                    pos_cache.append(pos)
             if line_tokens:
+                tokens.extend(line_tokens)
                 original_lines.append(" ".join(line_tokens))
 
-        surfaces, pos_list = self.parse_with_pos(text)
-        tokens = [s for s in surfaces if s not in stop_set and len(s) > 1]
-        pos_cache = [p for s, p in zip(surfaces, pos_list) if s not in stop_set and len(s) > 1]
         word_freq = Counter(tokens)
+        surface_to_pos = dict(zip(surfaces, pos_list))
 
         return TokenizationResult(
             tokens=tokens,
@@ -65,40 +218,77 @@ class TokenizationService:
             original_lines=original_lines,
             surfaces=surfaces,
             pos_list=pos_list,
+            surface_to_pos=surface_to_pos,
         )
 
     @staticmethod
-    def apply_merge_rules_to_line(tokens_line: Sequence[str], merge_rules: Sequence[dict]) -> List[str]:
-        rules_sorted = sorted(merge_rules, key=lambda r: r["len"], reverse=True)
+    def compile_merge_rules(merge_rules: MergeRules) -> Dict[Optional[str], object]:
+        """連語ルールを語単位のトライ木にまとめる。
+
+        各ノードは「次の語 -> 子ノード」の辞書で、ルールの終端ノードには None をキーに結合語を置く。
+        同じ語列のルールが複数あるときは先に現れたものを優先する。
+        """
+        if isinstance(merge_rules, Mapping):
+            rule_items = merge_rules.items()
+        else:
+            rule_items = ((r["seq"], r["merged"]) for r in merge_rules)
+        trie: Dict[Optional[str], object] = {}
+        # 解析結果の表層形は intern 済みなので、トライ木のキーと結合語もそろえて照合を参照比較で済ませる
+        for seq, merged in rule_items:
+            node = trie
+            for token in seq:
+                node = node.setdefault(sys.intern(token), {})
+            node.setdefault(None, sys.intern(merged))
+        return trie
+
+    @staticmethod
+    def apply_merge_trie(tokens_line: Sequence[str], trie: Dict[Optional[str], object]) -> List[str]:
+        """compile_merge_rules のトライ木で1行を走査し、各位置で最長一致したルールを結合する。"""
         out: List[str] = []
         i = 0
         n_tokens = len(tokens_line)
         while i < n_tokens:
-            matched = False
-            for r in rules_sorted:
-                n = r["len"]
-                if i + n <= n_tokens and tuple(tokens_line[i:i + n]) == r["seq"]:
-                    out.append(r["merged"])
-                    i += n
-                    matched = True
+            node = trie
+            match_end = 0
+            merged = None
+            j = i
+            while j < n_tokens:
+                node = node.get(tokens_line[j])
+                if node is None:
                     break
-            if not matched:
+                j += 1
+                if None in node:
+                    match_end, merged = j, node[None]
+            if match_end:
+                out.append(merged)
+                i = match_end
+            else:
                 out.append(tokens_line[i])
                 i += 1
         return out
 
+    @staticmethod
+    def apply_merge_rules_to_line(tokens_line: Sequence[str], merge_rules: MergeRules) -> List[str]:
+        trie = TokenizationService.compile_merge_rules(merge_rules)
+        return TokenizationService.apply_merge_trie(tokens_line, trie)
+
     @staticmethod
     def merge_lines(
         pre_tokens_lines: Sequence[Sequence[str]],
-        merge_rules: Sequence[dict],
+        merge_rules: MergeRules,
         stop_words: Iterable[str],
+        trie: Optional[Dict[Optional[str], object]] = None,
     ) -> Tuple[List[List[str]], List[str]]:
+        """trie に compile_merge_rules(merge_rules) の結果を渡せば、ルールの変換を省く。"""
         stop_set = set(stop_words)
+        # ルールは行ごとではなく1回だけトライ木に変換する
+        if trie is None:
+            trie = TokenizationService.compile_merge_rules(merge_rules)
         merged_lines: List[List[str]] = []
         filtered_tokens: List[str] = []
         for tokens_line in pre_tokens_lines:
             new_line = (
-                TokenizationService.apply_merge_rules_to_line(tokens_line, merge_rules)
+                TokenizationService.apply_merge_trie(tokens_line, trie)
                 if merge_rules
                 else list(tokens_line)
             )
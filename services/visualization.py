@@ -1,19 +1,124 @@
 from __future__ import annotations
 
-from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Iterable, List, Mapping, Sequence
+from typing import Dict, List, Mapping, Sequence, Tuple
 
-import matplotlib.pyplot as plt
+import matplotlib
 import networkx as nx
 import numpy as np
-from matplotlib import cm, font_manager
+from matplotlib import font_manager
 from wordcloud import WordCloud  # WordCloud is MIT-licensed
 from PIL import Image
 
+try:
+    import igraph  # optional: 大きなグラフのコミュニティ検出を C 実装（Louvain）で行う
+except ImportError:
+    igraph = None
+
+try:
+    from fa2_modified import ForceAtlas2  # optional: 大きなグラフのレイアウトを Cython 実装の ForceAtlas2 で求める
+except ImportError:
+    try:
+        from fa2 import ForceAtlas2
+    except ImportError:
+        ForceAtlas2 = None
+
+from services.cooccurrence import CooccurrenceService
+
+
+@lru_cache(maxsize=16)
+def _get_cmap(name: str):
+    """名前からカラーマップを引く（再生成のたびにレジストリを引かないようキャッシュする）。
+
+    cm.get_cmap は matplotlib 3.9 で削除されたため、colormaps レジストリを使う。
+    """
+    return matplotlib.colormaps[name]
+
+
+@lru_cache(maxsize=4)
+def _load_mask(path: str, mtime: float, width: int, height: int) -> np.ndarray:
+    """マスク画像を読み込み、指定サイズのグレースケール配列にする。
+
+    同じ画像での再生成ではデコードとリサイズを省くためキャッシュする。mtime をキーに含めるので、
+    画像ファイルが更新されれば読み直す。キャッシュした配列を共有するため書き込み不可にしておく。
+    """
+    with Image.open(path) as img:
+        mask = np.array(img.resize((width, height)).convert("L"))
+    mask.flags.writeable = False
+    return mask
+
+
+def _top_items(word_freq: Mapping[str, int], k: int) -> Dict[str, int]:
+    """回数の多い順に上位 k 語を返す（同数の並びは heapq.nlargest / sorted と同じく先に出た語が先）。
+
+    k 番目の回数を np.partition で O(V) に求め、それ以上の候補だけを安定ソートする。
+    """
+    if len(word_freq) <= k:
+        return dict(sorted(word_freq.items(), key=itemgetter(1), reverse=True))
+    words = list(word_freq)
+    counts = np.fromiter(word_freq.values(), dtype=np.int64, count=len(words))
+    threshold = np.partition(counts, -k)[-k]
+    candidates = np.flatnonzero(counts >= threshold)
+    top = candidates[np.argsort(-counts[candidates], kind="stable")[:k]].tolist()
+    return {words[i]: word_freq[words[i]] for i in top}
+
+
+@dataclass
+class NetworkLayout:
+    """描画前の共起ネットワーク: 絞り込み後のグラフ・ノード座標・ノードごとのコミュニティ番号"""
+
+    graph: nx.Graph
+    pos: Dict[str, Tuple[float, float]]
+    comm_map: Dict[str, int]
+
 
 class VisualizationService:
-    """Generate matplotlib figures without GUI coupling."""
+    """Generate matplotlib figures without GUI coupling.
+
+    各 build_* は fig を受け取ると、その Figure をクリアして描き直す（GUI 側で Figure / Canvas を使い回すため）。
+    重い計算（compute_*）と matplotlib への描画（draw_*）は分けてあり、compute_* は Tk / matplotlib に
+    触れないためワーカースレッドから呼べる。build_* は両者を続けて呼ぶ。
+    """
+
+    # Kamada-Kawai は全点間距離と密なエネルギー最適化で O(V^2) 以上かかるため、これを超えるノード数ではばねモデルに切り替える
+    KAMADA_MAX_NODES = 150
+    # 大きなグラフでばねモデルに切り替えたときの反復回数
+    LARGE_GRAPH_SPRING_ITERATIONS = 50
+    # 同じく ForceAtlas2（fa2_modified / fa2 があるとき）を使う場合の反復回数の上限
+    LARGE_GRAPH_FA2_ITERATIONS = 100
+    # これを超えるノード数では貪欲法のモジュラリティ最大化をやめ、Louvain 法でコミュニティを求める
+    LOUVAIN_MIN_NODES = 200
+
+    def __init__(self):
+        # Kamada-Kawai 用の全点間距離: (重み付き辺集合, 距離表)。配色だけ変えた再生成などで同じグラフなら使い回す
+        self._kk_dist_cache = None
+
+    def _kamada_kawai_dist(self, G: nx.Graph):
+        """kamada_kawai_layout が内部で求める重み付き最短距離を、同じグラフなら前回の結果から返す"""
+        key = frozenset((frozenset((u, v)), w) for u, v, w in G.edges(data="weight"))
+        if self._kk_dist_cache is None or self._kk_dist_cache[0] != key:
+            self._kk_dist_cache = (key, dict(nx.all_pairs_dijkstra_path_length(G, weight="weight")))
+        return self._kk_dist_cache[1]
+
+    @staticmethod
+    def _prepare_figure(fig, figsize, **fig_kw):
+        """fig があればクリアして (fig, ax) を返し、なければ figsize の Figure を新しく作って返す
+
+        渡された fig は GUI のキャンバスに埋め込まれたもので、大きさはキャンバスのウィジェットに合わせて
+        決まるため figsize では変えない（Figure だけ大きさを変えると描画がキャンバスからはみ出して切れる）。
+        """
+        if fig is None:
+            # pyplot は読み込みが重く、GUI からは Figure を渡されるため使うときだけ読み込む
+            import matplotlib.pyplot as plt
+
+            return plt.subplots(figsize=figsize, **fig_kw)
+        fig.clf()
+        if "facecolor" in fig_kw:
+            fig.set_facecolor(fig_kw["facecolor"])
+        return fig, fig.add_subplot(111)
 
     def build_wordcloud_figure(
         self,
@@ -23,20 +128,30 @@ class VisualizationService:
         shape: str,
         font_path: str | None,
         custom_image_path: str | None = None,
+        fig=None,
+        max_words: int = 200,
     ):
+        wc = self.compute_wordcloud(word_freq, width, height, shape, font_path, custom_image_path, max_words)
+        return self.draw_wordcloud(wc, fig=fig)
+
+    def compute_wordcloud(
+        self,
+        word_freq: Mapping[str, int],
+        width: int,
+        height: int,
+        shape: str,
+        font_path: str | None,
+        custom_image_path: str | None = None,
+        max_words: int = 200,
+    ) -> WordCloud:
         mask = None
+        img_path = None
         if shape == "ellipse":
-            ellipse_path = Path(__file__).parent.parent / "frame_image" / "楕円.png"
-            if ellipse_path.exists():
-                img = Image.open(ellipse_path)
-                img = img.resize((width, height))
-                mask = np.array(img.convert("L"))
+            img_path = Path(__file__).parent.parent / "frame_image" / "楕円.png"
         elif shape == "custom" and custom_image_path:
             img_path = Path(custom_image_path)
-            if img_path.exists():
-                img = Image.open(img_path)
-                img = img.resize((width, height))
-                mask = np.array(img.convert("L"))
+        if img_path is not None and img_path.exists():
+            mask = _load_mask(str(img_path), img_path.stat().st_mtime, width, height)
 
         wc_kwargs = {
             "width": width,
@@ -47,14 +162,19 @@ class VisualizationService:
             "min_font_size": 10,
             "max_font_size": 100,
             "colormap": "tab10",
+            "max_words": max_words,
         }
         if mask is not None:
             wc_kwargs["mask"] = mask
             wc_kwargs["contour_width"] = 0
 
-        wc = WordCloud(**wc_kwargs).generate_from_frequencies(word_freq)
+        # WordCloud は全語を降順ソートしてから max_words 件に切るため、上位だけを渡して全体ソートを避ける
+        if len(word_freq) > max_words:
+            word_freq = _top_items(word_freq, max_words)
+        return WordCloud(**wc_kwargs).generate_from_frequencies(word_freq)
 
-        fig, ax = plt.subplots(figsize=(12, 7))
+    def draw_wordcloud(self, wc: WordCloud, fig=None):
+        fig, ax = self._prepare_figure(fig, (12, 7))
         ax.imshow(wc, interpolation="bilinear")
         ax.axis("off")
         ax.set_title("WordCloud", fontsize=16, pad=20)
@@ -85,105 +205,110 @@ class VisualizationService:
         spring_k: float | None = None,
         spring_iterations: int = 200,
         spring_seed: int | None = 42,
+        fig=None,
     ):
-        def _collapse_consecutive(seq: Iterable[str]) -> List[str]:
-            result: List[str] = []
-            prev = None
-            for item in seq:
-                if item != prev:
-                    result.append(item)
-                prev = item
-            return result
-
-        cooc_pairs = []
-        if window_mode == "sliding":
-            tokens_used = list(tokens)
-            if collapse_consecutive:
-                tokens_used = _collapse_consecutive(tokens_used)
-            for i in range(len(tokens_used)):
-                if tokens_used[i] not in word_freq:
-                    continue
-                window_seen = set() if dedup_pairs_per_line else None
-                for j in range(i + 1, min(i + window_size, len(tokens_used))):
-                    if tokens_used[j] not in word_freq:
-                        continue
-                    pair = tuple(sorted([tokens_used[i], tokens_used[j]]))
-                    if dedup_pairs_per_line:
-                        if pair not in window_seen:
-                            cooc_pairs.append(pair)
-                            window_seen.add(pair)
-                    else:
-                        cooc_pairs.append(pair)
-        else:
-            if pre_tokens_lines:
-                for surfaces in pre_tokens_lines:
-                    if not surfaces:
-                        continue
-                    line_tokens = [s for s in surfaces if s in word_freq]
-                    if collapse_consecutive:
-                        line_tokens = _collapse_consecutive(line_tokens)
-                    seen_pairs = set() if dedup_pairs_per_line else None
-                    for i in range(len(line_tokens)):
-                        for j in range(i + 1, len(line_tokens)):
-                            pair = tuple(sorted([line_tokens[i], line_tokens[j]]))
-                            if dedup_pairs_per_line:
-                                if pair not in seen_pairs:
-                                    cooc_pairs.append(pair)
-                                    seen_pairs.add(pair)
-                            else:
-                                cooc_pairs.append(pair)
-            else:
-                for line in original_lines:
-                    if not line.strip():
-                        continue
-                    line_tokens = line.split()
-                    if collapse_consecutive:
-                        line_tokens = _collapse_consecutive(line_tokens)
-                    seen_pairs = set() if dedup_pairs_per_line else None
-                    for i in range(len(line_tokens)):
-                        if line_tokens[i] not in word_freq:
-                            continue
-                        for j in range(i + 1, len(line_tokens)):
-                            if line_tokens[j] not in word_freq:
-                                continue
-                            pair = tuple(sorted([line_tokens[i], line_tokens[j]]))
-                            if dedup_pairs_per_line:
-                                if pair not in seen_pairs:
-                                    cooc_pairs.append(pair)
-                                    seen_pairs.add(pair)
-                            else:
-                                cooc_pairs.append(pair)
-
-        cooc_count = Counter(cooc_pairs)
-        cooc_count = Counter({p: c for p, c in cooc_count.items() if c >= min_cooc})
+        layout = self.compute_network(
+            tokens,
+            word_freq,
+            pre_tokens_lines,
+            original_lines,
+            window_mode=window_mode,
+            window_size=window_size,
+            collapse_consecutive=collapse_consecutive,
+            dedup_pairs_per_line=dedup_pairs_per_line,
+            self_loop_mode=self_loop_mode,
+            edge_count=edge_count,
+            min_cooc=min_cooc,
+            layout_mode=layout_mode,
+            spring_k=spring_k,
+            spring_iterations=spring_iterations,
+            spring_seed=spring_seed,
+        )
+        if layout is None:
+            return None
+        return self.draw_network(
+            layout,
+            word_freq,
+            net_width=net_width,
+            net_height=net_height,
+            cmap_name=cmap_name,
+            edge_cmap_name=edge_cmap_name,
+            node_size_scale=node_size_scale,
+            font_size_scale=font_size_scale,
+            show_legend=show_legend,
+            font_family=font_family,
+            fig=fig,
+        )
+
+    def compute_network(
+        self,
+        tokens: Sequence[str],
+        word_freq: Mapping[str, int],
+        pre_tokens_lines: Sequence[Sequence[str]] | None,
+        original_lines: Sequence[str],
+        window_mode: str,
+        window_size: int,
+        collapse_consecutive: bool,
+        dedup_pairs_per_line: bool,
+        self_loop_mode: str,
+        edge_count: int,
+        min_cooc: int,
+        layout_mode: str = "kamada",
+        spring_k: float | None = None,
+        spring_iterations: int = 200,
+        spring_seed: int | None = 42,
+        token_ids: np.ndarray | None = None,
+        token_vocab: Sequence[str] | None = None,
+    ) -> NetworkLayout | None:
+        """共起を数えてグラフを絞り込み、レイアウトとコミュニティ分割まで求める（描画はしない）
+
+        token_ids / token_vocab（tokens を token_vocab の添字で表した配列）を渡すと、スライディング窓では
+        トークン文字列を引き直さずにその id 列から数える。
+        """
+        vocab, word_ids = CooccurrenceService.build_vocab(word_freq)
+        cooc_count = CooccurrenceService.count_pairs(
+            window_mode,
+            vocab,
+            word_ids,
+            window_size,
+            dedup_pairs_per_line,
+            collapse_consecutive,
+            tokens=tokens,
+            token_ids=token_ids,
+            token_vocab=token_vocab,
+            pre_tokens_lines=pre_tokens_lines,
+            original_lines=original_lines,
+            min_count=min_cooc,
+            top_n=edge_count,
+        )
+
+        # cooc_count は min_cooc 未満と上位 edge_count 件より下を集計時に落としてあるので、自己ループの除外だけ行って一括追加する
+        drop_self_loops = self_loop_mode == "remove"
         G = nx.Graph()
-        for (word1, word2), count in cooc_count.most_common(edge_count):
-            if word1 == word2 and self_loop_mode == "remove":
-                continue
-            if count < min_cooc:
-                continue
-            G.add_edge(word1, word2, weight=count)
+        G.add_weighted_edges_from(
+            (word1, word2, count)
+            for (word1, word2), count in cooc_count.most_common(edge_count)
+            if not (drop_self_loops and word1 == word2)
+        )
 
         if len(G.nodes()) == 0:
             return None
 
-        if not nx.is_connected(G):
-            largest_cc = max(nx.connected_components(G), key=len)
-            G = G.subgraph(largest_cc).copy()
-
-        if len(G.edges()) > 0:
-            max_weight_val = max([d["weight"] for _, _, d in G.edges(data=True)])
-            min_weight = max(1, max_weight_val // 5)
-            G = nx.Graph([(u, v, d) for u, v, d in G.edges(data=True) if d["weight"] >= min_weight])
+        # 最大連結成分への絞り込みと弱い辺の除去を1回の走査にまとめ、新しいグラフは1つだけ作る
+        # 連結判定は成分列挙1回で済ませる（is_connected を別に呼ぶと BFS が2回になる）
+        components = list(nx.connected_components(G))
+        largest_cc = max(components, key=len) if len(components) > 1 else None
+        kept_edges = [
+            (u, v, w) for u, v, w in G.edges(data="weight") if largest_cc is None or u in largest_cc
+        ]
+        if kept_edges:
+            min_weight = max(1, max(w for _, _, w in kept_edges) // 5)
+            G = nx.Graph()
+            G.add_weighted_edges_from(e for e in kept_edges if e[2] >= min_weight)
 
         if len(G.nodes()) < 2:
             return None
 
-        fig_w = net_width / 100
-        fig_h = net_height / 100
-        fig, ax = plt.subplots(figsize=(fig_w, fig_h), facecolor="white")
-        ax.set_facecolor("white")
-
         pos = {}
         layout_mode = (layout_mode or "kamada").lower()
         if layout_mode == "spring":
@@ -192,39 +317,96 @@ class VisualizationService:
                 pos = nx.spring_layout(G, k=k_val, iterations=max(10, spring_iterations), seed=spring_seed, scale=2, weight="weight")
             except Exception:
                 pos = nx.spring_layout(G, seed=spring_seed, scale=2, weight="weight")
+        elif G.number_of_nodes() > self.KAMADA_MAX_NODES and ForceAtlas2 is not None:
+            pos = self._forceatlas2_layout(
+                G, min(max(10, spring_iterations), self.LARGE_GRAPH_FA2_ITERATIONS), spring_seed
+            )
+        elif G.number_of_nodes() > self.KAMADA_MAX_NODES:
+            pos = nx.spring_layout(
+                G,
+                iterations=min(max(10, spring_iterations), self.LARGE_GRAPH_SPRING_ITERATIONS),
+                seed=spring_seed,
+                scale=2,
+                weight="weight",
+            )
         else:
             try:
-                pos = nx.kamada_kawai_layout(G, scale=2)
+                pos = nx.kamada_kawai_layout(G, dist=self._kamada_kawai_dist(G), scale=2)
             except Exception:
                 k_val = spring_k if spring_k and spring_k > 0 else None
                 pos = nx.spring_layout(G, k=k_val, iterations=max(10, spring_iterations), seed=spring_seed, scale=2, weight="weight")
 
-        communities = list(nx.community.greedy_modularity_communities(G))
+        communities = self._detect_communities(G)
         comm_map = {}
         for idx, nodes in enumerate(communities):
             for n in nodes:
                 comm_map[n] = idx
+        return NetworkLayout(graph=G, pos=pos, comm_map=comm_map)
+
+    def _forceatlas2_layout(self, G: nx.Graph, iterations: int, seed: int | None) -> Dict[str, Tuple[float, float]]:
+        """大きなグラフ用の ForceAtlas2 レイアウト。初期配置は seed で固定し、spring_layout と同じ scale=2 にそろえる"""
+        initial = nx.random_layout(G, seed=seed)
+        forceatlas2 = ForceAtlas2(gravity=1.0, scalingRatio=2.0, verbose=False)
+        pos = forceatlas2.forceatlas2_networkx_layout(G, pos=initial, iterations=iterations, weight_attr="weight")
+        return nx.rescale_layout_dict(pos, scale=2)
+
+    def _detect_communities(self, G: nx.Graph) -> List[set]:
+        """ノードのコミュニティ分割。大きなグラフは Louvain 法（igraph があればその C 実装）を使う"""
+        if G.number_of_nodes() <= self.LOUVAIN_MIN_NODES:
+            return list(nx.community.greedy_modularity_communities(G))
+        if igraph is not None:
+            ig = igraph.Graph.from_networkx(G)
+            names = ig.vs["_nx_name"]
+            return [{names[i] for i in part} for part in ig.community_multilevel(weights="weight")]
+        return nx.community.louvain_communities(G, weight="weight", seed=0)
+
+    def draw_network(
+        self,
+        layout: NetworkLayout,
+        word_freq: Mapping[str, int],
+        net_width: int,
+        net_height: int,
+        cmap_name: str,
+        edge_cmap_name: str = "Blues",
+        node_size_scale: float = 1.0,
+        font_size_scale: float = 1.0,
+        show_legend: bool = True,
+        font_family: str | None = None,
+        fig=None,
+    ):
+        G, pos, comm_map = layout.graph, layout.pos, layout.comm_map
+        fig_w = net_width / 100
+        fig_h = net_height / 100
+        fig, ax = self._prepare_figure(fig, (fig_w, fig_h), facecolor="white")
+        ax.set_facecolor("white")
 
-        node_sizes = [max(300, word_freq.get(node, 1) * 150) * node_size_scale for node in G.nodes()]
-        edges = G.edges()
-        weights = [G[u][v]["weight"] for u, v in edges]
+        # ノードの頻度・コミュニティ番号は配列にまとめ、サイズと色はベクトル演算で求める
+        nodes = list(G.nodes())
+        node_freqs = np.fromiter((word_freq.get(n, 1) for n in nodes), dtype=np.int64, count=len(nodes))
+        node_colors = np.fromiter((comm_map.get(n, 0) for n in nodes), dtype=np.int64, count=len(nodes))
+        node_sizes = np.maximum(300, node_freqs * 150) * node_size_scale
+        # 辺と重みを1回の走査で取り出し、描画は1つの LineCollection にまとめて渡す
+        edge_list = list(G.edges(data="weight"))
+        edges = [(u, v) for u, v, _ in edge_list]
+        weights = [w for _, _, w in edge_list]
         max_weight = max(weights) if weights else 1
-        normalized_weights = [w / max_weight for w in weights]
+        normalized_weights = np.asarray(weights, dtype=float) / max_weight
 
         try:
-            cmap = cm.get_cmap(cmap_name)
+            cmap = _get_cmap(cmap_name)
         except Exception:
-            cmap = cm.get_cmap("Pastel1")
+            cmap = _get_cmap("Pastel1")
 
         try:
-            edge_cmap = cm.get_cmap(edge_cmap_name)
+            edge_cmap = _get_cmap(edge_cmap_name)
         except Exception:
-            edge_cmap = cm.Blues
+            edge_cmap = _get_cmap("Blues")
 
         nx.draw_networkx_nodes(
             G,
             pos,
-            node_color=[comm_map.get(n, 0) for n in G.nodes()],
+            nodelist=nodes,
+            node_color=node_colors,
             cmap=cmap,
             node_size=node_sizes,
             ax=ax,
@@ -233,7 +415,8 @@ class VisualizationService:
         nx.draw_networkx_edges(
             G,
             pos,
-            width=[1 + w * 4 for w in normalized_weights],
+            edgelist=edges,
+            width=1 + normalized_weights * 4,
             edge_color=normalized_weights,
             edge_cmap=edge_cmap,
             alpha=0.6,
@@ -257,9 +440,8 @@ class VisualizationService:
             from matplotlib.patches import Patch
             
             # ノード頻度の範囲を取得
-            node_freqs = [word_freq.get(node, 1) for node in G.nodes()]
-            min_freq = min(node_freqs) if node_freqs else 1
-            max_freq = max(node_freqs) if node_freqs else 1
+            min_freq = int(node_freqs.min()) if len(node_freqs) else 1
+            max_freq = int(node_freqs.max()) if len(node_freqs) else 1
             mid_freq = (min_freq + max_freq) // 2
             
             # ノードサイズの凡例
@@ -326,8 +508,7 @@ class VisualizationService:
             if font_family and legend.get_title():
                 legend.get_title().set_fontproperties(legend_font)
 
-            # 凡例ぶんの右余白を確保（動的に計算）
-            fig.canvas.draw()
+            # 凡例ぶんの右余白を確保（動的に計算）。凡例の幅は renderer があれば測れるので、図全体は描画しない
             legend_bbox = legend.get_window_extent(renderer=fig.canvas.get_renderer())
             legend_width_inches = legend_bbox.width / fig.dpi
             right_margin = min(0.35, 0.05 + legend_width_inches / fig_w)
@@ -335,9 +516,10 @@ class VisualizationService:
         
         return fig
 
-    def build_frequency_figure(self, word_freq: Mapping[str, int]):
-        top_words = dict(sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:30])
-        fig, ax = plt.subplots(figsize=(12, 8))
+    def build_frequency_figure(self, word_freq: Mapping[str, int], fig=None):
+        # 全語のソートは不要なので上位30件だけを取り出す（同数の並びは sorted と同じ）
+        top_words = _top_items(word_freq, 30)
+        fig, ax = self._prepare_figure(fig, (12, 8))
         words = list(top_words.keys())
         counts = list(top_words.values())
 
@@ -345,5 +527,5 @@ class VisualizationService:
         ax.set_xlabel("出現回数", fontsize=12)
         ax.set_title(f"単語出現頻度（全{len(word_freq)}単語中の上位30単語）", fontsize=16, pad=20)
         ax.invert_yaxis()
-        plt.tight_layout()
+        fig.tight_layout()
         return fig
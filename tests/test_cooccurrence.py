@@ -0,0 +1,141 @@
+"""Unit tests for the co-occurrence counting service.
+
+These tests run without a Tkinter context and only verify the
+service-layer behavior.
+"""
+
+from collections import Counter
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from services.cooccurrence import CooccurrenceService
+
+
+LINES = [
+    ["人工", "知能", "人工", "進化"],
+    ["進化", "未来", "未来"],
+    ["AI"],
+]
+
+
+def naive_line_pairs(lines, dedup):
+    counts = Counter()
+    for line in lines:
+        seen = set()
+        for i in range(len(line)):
+            for j in range(i + 1, len(line)):
+                pair = tuple(sorted([line[i], line[j]]))
+                if dedup and pair in seen:
+                    continue
+                seen.add(pair)
+                counts[pair] += 1
+    return counts
+
+
+def test_count_line_pairs_matches_pairwise_loop():
+    vocab, word_ids = CooccurrenceService.build_vocab(w for line in LINES for w in line)
+    for dedup in (False, True):
+        counted = CooccurrenceService.count_line_pairs(LINES, vocab, word_ids, dedup)
+        assert counted == naive_line_pairs(LINES, dedup)
+
+
+def test_count_line_pairs_ignores_out_of_vocab_words():
+    vocab, word_ids = CooccurrenceService.build_vocab(["人工", "進化"])
+    counted = CooccurrenceService.count_line_pairs(LINES, vocab, word_ids, False)
+    assert counted == Counter({("人工", "進化"): 2, ("人工", "人工"): 1})
+
+
+def naive_sliding_pairs(tokens, vocab, window_size, dedup):
+    counts = Counter()
+    for i in range(len(tokens)):
+        if tokens[i] not in vocab:
+            continue
+        seen = set()
+        for j in range(i + 1, min(i + window_size, len(tokens))):
+            if tokens[j] not in vocab:
+                continue
+            pair = tuple(sorted([tokens[i], tokens[j]]))
+            if dedup and pair in seen:
+                continue
+            seen.add(pair)
+            counts[pair] += 1
+    return counts
+
+
+def test_count_sliding_pairs_matches_window_loop():
+    tokens = ["人工", "知能", "人工", "の", "進化", "人工", "未来", "未来"]
+    vocab, word_ids = CooccurrenceService.build_vocab(["人工", "知能", "進化", "未来"])
+    for window_size in (2, 3, 5):
+        for dedup in (False, True):
+            counted = CooccurrenceService.count_sliding_pairs(tokens, vocab, word_ids, window_size, dedup)
+            assert counted == naive_sliding_pairs(tokens, set(vocab), window_size, dedup)
+
+
+def test_min_count_drops_rare_pairs_before_decoding():
+    vocab, word_ids = CooccurrenceService.build_vocab(w for line in LINES for w in line)
+    counted = CooccurrenceService.count_line_pairs(LINES, vocab, word_ids, False, min_count=2)
+    expected = Counter({p: c for p, c in naive_line_pairs(LINES, False).items() if c >= 2})
+    assert counted == expected
+    assert list(counted.most_common()) == list(expected.most_common())
+
+
+def test_sliding_pair_ids_from_remapped_vocab_match_string_path():
+    tokens = ["人工", "知能", "人工", "の", "進化", "人工", "未来", "未来"]
+    token_vocab = list(dict.fromkeys(tokens))
+    token_ids = [token_vocab.index(t) for t in tokens]
+    vocab, word_ids = CooccurrenceService.build_vocab(["人工", "知能", "進化", "未来"])
+    all_ids = CooccurrenceService.remap_ids(np.array(token_ids), token_vocab, word_ids)
+    for dedup in (False, True):
+        counted = CooccurrenceService.count_sliding_pair_ids(all_ids, vocab, 3, dedup)
+        assert counted == CooccurrenceService.count_sliding_pairs(tokens, vocab, word_ids, 3, dedup)
+
+
+def test_top_n_keeps_most_common_order_including_ties():
+    vocab, word_ids = CooccurrenceService.build_vocab(w for line in LINES for w in line)
+    full = CooccurrenceService.count_line_pairs(LINES, vocab, word_ids, False)
+    for n in (0, 1, 3, 100):
+        top = CooccurrenceService.count_line_pairs(LINES, vocab, word_ids, False, top_n=n)
+        assert top.most_common() == full.most_common(n)
+
+
+def test_count_line_pairs_collapses_consecutive_in_vocab_words():
+    lines = [["人工", "の", "人工", "知能", "知能", "進化"], ["未来", "未来"]]
+    vocab, word_ids = CooccurrenceService.build_vocab(["人工", "知能", "進化", "未来"])
+    expected_lines = [["人工", "知能", "進化"], ["未来"]]
+    for dedup in (False, True):
+        counted = CooccurrenceService.count_line_pairs(lines, vocab, word_ids, dedup, collapse_consecutive=True)
+        assert counted == naive_line_pairs(expected_lines, dedup)
+
+
+def test_count_pairs_sliding_ids_match_token_strings():
+    tokens = ["人工", "人工", "知能", "進化", "人工", "知能", "未来", "未来"]
+    vocab, word_ids = CooccurrenceService.build_vocab(["人工", "知能", "未来"])
+    token_vocab = list(dict.fromkeys(tokens))
+    token_ids = np.array([token_vocab.index(t) for t in tokens], dtype=np.int32)
+    for collapse in (False, True):
+        from_strings = CooccurrenceService.count_pairs(
+            "sliding", vocab, word_ids, 3, False, collapse, tokens=tokens
+        )
+        from_ids = CooccurrenceService.count_pairs(
+            "sliding", vocab, word_ids, 3, False, collapse, token_ids=token_ids, token_vocab=token_vocab
+        )
+        assert from_strings == from_ids
+        assert from_strings == CooccurrenceService.count_sliding_pairs(
+            CooccurrenceService.collapse_consecutive(tokens) if collapse else tokens, vocab, word_ids, 3, False
+        )
+
+
+def test_count_pairs_line_mode_falls_back_to_original_lines():
+    vocab, word_ids = CooccurrenceService.build_vocab(w for line in LINES for w in line)
+    original_lines = [" ".join(line) for line in LINES]
+    from_original = CooccurrenceService.count_pairs(
+        "line", vocab, word_ids, 3, False, False, original_lines=original_lines
+    )
+    assert from_original == CooccurrenceService.count_pairs(
+        "line", vocab, word_ids, 3, False, False, pre_tokens_lines=LINES
+    )
+    assert from_original == naive_line_pairs(LINES, dedup=False)
@@ -0,0 +1,41 @@
+"""Unit tests for the CSV helpers used by the GUI.
+
+These tests run without a Tkinter context and only verify the
+service-layer behavior.
+"""
+
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from services.files import FileService
+
+
+def test_detect_csv_content_reads_cp932_with_crlf(tmp_path):
+    path = tmp_path / "sample.csv"
+    path.write_bytes("id,本文\r\n1,人工知能の進化\r\n2,機械学習\r\n".encode("cp932"))
+    result = FileService().detect_csv_content(str(path))
+    assert result.used_encoding == "cp932"
+    assert result.delimiter == ","
+    assert result.rows == [["id", "本文"], ["1", "人工知能の進化"], ["2", "機械学習"]]
+
+
+def test_combine_columns_skips_header():
+    rows = [["id", "本文", "補足"], ["1", "人工知能", "進化"], ["2", "機械学習"]]
+    assert FileService.combine_columns(rows, [1, 2], has_header=True) == "人工知能 進化\n機械学習"
+
+
+def test_combine_columns_strips_cells_and_keeps_empty_rows():
+    rows = [[" 人工知能 ", "", "進化"], ["", " "], ["機械学習"]]
+    assert FileService.combine_columns(rows, [0, 1, 2], has_header=False) == "人工知能 進化\n\n機械学習"
+
+
+def test_detect_csv_content_rejects_candidate_failing_after_first_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(FileService, "DETECT_SAMPLE_BYTES", 8)
+    path = tmp_path / "sample.csv"
+    # 先頭は ASCII のみで utf-8 としても読めるが、後半の cp932 の本文で utf-8 のデコードに失敗する
+    path.write_bytes("id,text\r\n1,abcdefgh\r\n2,人工知能\r\n".encode("cp932"))
+    result = FileService().detect_csv_content(str(path))
+    assert result.used_encoding == "cp932"
+    assert result.rows[-1] == ["2", "人工知能"]
@@ -13,21 +13,37 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 from services.tokenization import TokenizationService
 
 
-class DummyTagger:
+class DummyMorpheme:
+    def __init__(self, surface, pos):
+        self._surface = surface
+        self._pos = pos
+
+    def surface(self):
+        return self._surface
+
+    def part_of_speech(self):
+        return (self._pos, "*", "*", "*", "*", "*")
+
+
+class DummyTokenizer:
     def __init__(self, responses):
         self.responses = responses
 
-    def parse(self, text):
-        return self.responses.get(text, self.responses["default"])
+    def tokenize(self, text):
+        rows = self.responses.get(text, self.responses["default"])
+        return [DummyMorpheme(surface, pos) for surface, pos in rows]
 
 
 def build_service():
     responses = {
-        "default": "人工知能\t*\t*\t名詞-一般\n進化\t*\t*\t名詞-一般\nEOS",
-        "人工知能 進化": "人工知能\t*\t*\t名詞-一般\n進化\t*\t*\t名詞-一般\nEOS",
-        "人工 知能 進化": "人工\t*\t*\t名詞-一般\n知能\t*\t*\t名詞-一般\n進化\t*\t*\t名詞-一般\nEOS",
+        "default": [("人工知能", "名詞"), ("進化", "名詞")],
+        "人工知能 進化": [("人工知能", "名詞"), (" ", "空白"), ("進化", "名詞")],
+        "人工 知能 進化": [("人工", "名詞"), (" ", "空白"), ("知能", "名詞"), (" ", "空白"), ("進化", "名詞")],
+        "人工知能": [("人工知能", "名詞")],
+        "": [],
+        "進化する": [("進化", "名詞"), ("する", "動詞")],
     }
-    return TokenizationService(DummyTagger(responses))
+    return TokenizationService(DummyTokenizer(responses))
 
 
 def test_tokenize_filters_stopwords():
@@ -38,6 +54,26 @@ def test_tokenize_filters_stopwords():
     assert result.original_lines == ["人工知能"]
 
 
+def test_tokenize_keeps_per_line_tokens():
+    service = build_service()
+    result = service.tokenize_text("人工知能\n\n進化する", stop_words=set())
+    assert result.pre_tokens_lines == [["人工知能"], [], ["進化", "する"]]
+    assert result.original_lines == ["人工知能", "進化 する"]
+    assert result.surface_to_pos["する"] == "動詞"
+
+
+def test_parse_line_is_cached_until_cleared():
+    service = build_service()
+    calls = []
+    tokenize = service.tokenizer.tokenize
+    service.tokenizer.tokenize = lambda text: calls.append(text) or tokenize(text)
+    service.tokenize_text("人工知能\n人工知能", stop_words=set())
+    assert calls == ["人工知能"]
+    service.clear_cache()
+    service.parse_line("人工知能")
+    assert calls == ["人工知能", "人工知能"]
+
+
 def test_apply_merge_rules_to_line_prefers_longer_match():
     service = build_service()
     rules = [{"len": 2, "seq": ("人工", "知能"), "merged": "人工知能"}]
@@ -52,3 +88,179 @@ def test_merge_lines_applies_rules_and_filters_stopwords():
     merged_lines, filtered = service.merge_lines(pre_tokens_lines, rules, stop_words={"AI"})
     assert merged_lines[0] == ["人工知能", "AI"]
     assert filtered == ["人工知能", "進化", "未来"]
+
+
+def test_tokenize_skips_blank_and_symbol_only_lines():
+    service = build_service()
+    calls = []
+    original = service.tokenizer.tokenize
+    service.tokenizer.tokenize = lambda text: calls.append(text) or original(text)
+    result = service.tokenize_text("人工知能\n  \n。、――\n進化する", stop_words=set())
+    assert calls == ["人工知能", "進化する"]
+    assert result.pre_tokens_lines == [["人工知能"], [], [], ["進化", "する"]]
+    assert result.tokens == ["人工知能", "進化", "する"]
+
+
+def test_tokenize_parallel_matches_serial():
+    responses = {
+        "default": [("人工知能", "名詞"), ("進化", "名詞")],
+        "進化する": [("進化", "名詞"), ("する", "動詞")],
+    }
+    text = "\n".join(["進化する" if i % 3 == 0 else f"行{i}" for i in range(40)])
+
+    serial = TokenizationService(DummyTokenizer(responses)).tokenize_text(text, stop_words={"する"})
+
+    created = []
+
+    def factory():
+        created.append(1)
+        return DummyTokenizer(responses)
+
+    service = TokenizationService(DummyTokenizer(responses), tokenizer_factory=factory, max_workers=2)
+    service.PARALLEL_MIN_LINES = 10
+    parallel = service.tokenize_text(text, stop_words={"する"})
+
+    assert created
+    assert parallel.pre_tokens_lines == serial.pre_tokens_lines
+    assert parallel.tokens == serial.tokens
+    assert parallel.surface_to_pos == serial.surface_to_pos
+
+
+def test_split_lines_matches_tokenize_pre_tokens():
+    service = build_service()
+    text = "人工知能 進化\n\n、。\n人工知能 進化"
+    expected = service.tokenize_text(text, stop_words=set()).pre_tokens_lines
+    assert service.split_lines(text.split("\n")) == expected
+
+
+def test_split_text_reuses_parse_for_same_text():
+    service = build_service()
+    text = "人工知能 進化\n\n人工知能 進化"
+    first = service.split_text(text)
+    assert service.split_text(text) is first
+    assert [list(line) for line in first] == service.split_lines(text.split("\n"))
+
+
+def test_apply_merge_trie_takes_longest_overlapping_rule():
+    service = build_service()
+    rules = [
+        {"len": 2, "seq": ("人工", "知能"), "merged": "人工知能"},
+        {"len": 3, "seq": ("人工", "知能", "研究"), "merged": "人工知能研究"},
+        {"len": 2, "seq": ("知能", "進化"), "merged": "知能進化"},
+    ]
+    trie = service.compile_merge_rules(rules)
+    assert service.apply_merge_trie(["人工", "知能", "研究", "人工", "知能", "進化"], trie) == [
+        "人工知能研究",
+        "人工知能",
+        "進化",
+    ]
+    assert service.apply_merge_trie(["人工", "知能", "進化"], trie) == service.apply_merge_rules_to_line(
+        ["人工", "知能", "進化"], rules
+    )
+
+
+def test_merge_lines_accepts_rules_keyed_by_sequence():
+    service = build_service()
+    pre_tokens_lines = [["人工", "知能", "AI"], ["進化", "未来"]]
+    rules = {("人工", "知能"): "人工知能", ("進化", "未来"): "進化未来"}
+    merged_lines, filtered = service.merge_lines(pre_tokens_lines, rules, stop_words={"AI"})
+    assert merged_lines == [["人工知能", "AI"], ["進化未来"]]
+    assert filtered == ["人工知能", "進化未来"]
+
+
+def test_tokenize_reuses_one_tokenizer_for_serial_parsing():
+    created = []
+    responses = {"default": [("人工知能", "名詞"), ("進化", "名詞")]}
+
+    def factory():
+        created.append(1)
+        return DummyTokenizer(responses)
+
+    service = TokenizationService(DummyTokenizer(responses), tokenizer_factory=factory, max_workers=2)
+    text = "\n".join(f"行{i}" for i in range(service.PARALLEL_MIN_LINES - 1))
+    result = service.tokenize_text(text, stop_words=set())
+    assert len(result.pre_tokens_lines) == service.PARALLEL_MIN_LINES - 1
+    assert created == []
+
+
+def test_split_text_pos_and_pos_of_share_the_line_cache():
+    service = build_service()
+    calls = []
+    tokenize = service.tokenizer.tokenize
+    service.tokenizer.tokenize = lambda text: calls.append(text) or tokenize(text)
+    assert service.split_text_pos("進化する\n人工知能") == {"進化": "名詞", "する": "動詞", "人工知能": "名詞"}
+    assert service.pos_of("人工知能") == "名詞"
+    assert calls == ["進化する", "人工知能"]
+
+
+def test_default_tokenizers_share_one_loaded_dictionary(monkeypatch):
+    from services import tokenization
+
+    loaded = []
+
+    class FakeDictionary:
+        def __init__(self, config):
+            loaded.append(config)
+
+        def create(self, fields=None):
+            return DummyTokenizer({"default": []})
+
+    monkeypatch.setattr(tokenization.sudachipy, "Config", lambda: "config", raising=False)
+    monkeypatch.setattr(tokenization.sudachipy, "Dictionary", FakeDictionary, raising=False)
+    tokenization._load_sudachi_dictionary.cache_clear()
+    try:
+        TokenizationService()
+        TokenizationService()
+        tokenization.create_sudachi_tokenizer_factory()()
+    finally:
+        tokenization._load_sudachi_dictionary.cache_clear()
+    assert loaded == ["config"]
+
+
+def test_pos_of_many_matches_pos_of():
+    service = build_service()
+    words = ["人工知能", "", "進化する", "人工知能"]
+    assert service.pos_of_many(words) == [service.pos_of(w) for w in words] == ["名詞", "", "名詞", "名詞"]
+
+
+def test_tokenizer_factory_passes_fields_as_a_plain_set(monkeypatch):
+    from services import tokenization
+
+    received = []
+
+    class FakeDictionary:
+        def __init__(self, config):
+            pass
+
+        def create(self, fields=None):
+            # 本物の Dictionary.create も set 以外（frozenset など）を受け付けない
+            if type(fields) is not set:
+                raise TypeError("fields must be a set")
+            received.append(fields)
+            return DummyTokenizer({"default": []})
+
+    monkeypatch.setattr(tokenization.sudachipy, "Config", lambda: "config", raising=False)
+    monkeypatch.setattr(tokenization.sudachipy, "Dictionary", FakeDictionary, raising=False)
+    tokenization._load_sudachi_dictionary.cache_clear()
+    try:
+        tokenization.create_sudachi_tokenizer_factory()()
+    finally:
+        tokenization._load_sudachi_dictionary.cache_clear()
+    assert received == [set(tokenization.SUDACHI_FIELDS)]
+
+
+def test_tokenizer_factory_works_with_the_installed_dictionary():
+    import pytest
+    from services import tokenization
+
+    tokenization._load_sudachi_dictionary.cache_clear()
+    try:
+        try:
+            factory = tokenization.create_sudachi_tokenizer_factory()
+        except Exception as e:  # 辞書が入っていない環境では確認できない
+            pytest.skip(f"Sudachi dictionary unavailable: {e}")
+        surfaces, pos_list = TokenizationService(factory(), tokenizer_factory=factory).parse_with_pos("人工知能")
+    finally:
+        tokenization._load_sudachi_dictionary.cache_clear()
+    assert "".join(surfaces) == "人工知能"
+    assert all(pos_list)
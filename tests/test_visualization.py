@@ -0,0 +1,124 @@
+"""Unit tests for the figure-building service.
+
+These tests run without a Tkinter context and render with the Agg
+backend; they only verify the service-layer behavior.
+"""
+
+from pathlib import Path
+import sys
+import warnings
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from services.visualization import VisualizationService
+
+
+TOKENS = ["人工", "知能", "進化", "人工", "知能", "未来", "人工", "進化", "未来", "知能"]
+WORD_FREQ = {"人工": 3, "知能": 3, "進化": 2, "未来": 2}
+
+
+def build_network(**overrides):
+    kwargs = dict(
+        window_mode="sliding",
+        window_size=3,
+        collapse_consecutive=False,
+        dedup_pairs_per_line=False,
+        self_loop_mode="remove",
+        edge_count=50,
+        min_cooc=1,
+        net_width=600,
+        net_height=400,
+        cmap_name="Pastel1",
+    )
+    kwargs.update(overrides)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return VisualizationService().build_network_figure(TOKENS, WORD_FREQ, None, [], **kwargs)
+
+
+def test_network_figure_draws_all_words():
+    fig = build_network()
+    assert fig is not None
+    labels = {t.get_text() for t in fig.axes[0].texts}
+    assert labels == set(WORD_FREQ)
+
+
+def test_network_figure_falls_back_on_unknown_colormaps():
+    fig = build_network(cmap_name="no-such-map", edge_cmap_name="no-such-map", show_legend=False)
+    assert fig is not None
+
+
+def test_large_graph_communities_cover_every_node():
+    import networkx as nx
+
+    service = VisualizationService()
+    service.LOUVAIN_MIN_NODES = 5
+    G = nx.barbell_graph(6, 0)
+    nx.set_edge_attributes(G, 1, "weight")
+    communities = service._detect_communities(G)
+    assert set().union(*communities) == set(G.nodes())
+    assert sum(len(c) for c in communities) == G.number_of_nodes()
+
+
+def test_wordcloud_mask_is_decoded_once_per_file(tmp_path):
+    from PIL import Image
+
+    from services import visualization
+
+    mask_path = tmp_path / "mask.png"
+    Image.new("L", (40, 30), 0).save(mask_path)
+    visualization._load_mask.cache_clear()
+    service = VisualizationService()
+    for _ in range(2):
+        service.compute_wordcloud(WORD_FREQ, 80, 60, "custom", None, str(mask_path))
+    info = visualization._load_mask.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+
+
+def test_large_graph_layout_uses_forceatlas2_when_available(monkeypatch):
+    from services import visualization
+
+    calls = []
+
+    class FakeForceAtlas2:
+        def __init__(self, **kwargs):
+            pass
+
+        def forceatlas2_networkx_layout(self, G, pos=None, iterations=100, weight_attr=None):
+            calls.append(iterations)
+            return {n: (float(i), -float(i)) for i, n in enumerate(G.nodes())}
+
+    monkeypatch.setattr(visualization, "ForceAtlas2", FakeForceAtlas2)
+    service = VisualizationService()
+    service.KAMADA_MAX_NODES = 2
+    tokens = ["a", "b", "c", "d", "a", "c", "b", "d"]
+    layout = service.compute_network(
+        tokens, {w: 2 for w in "abcd"}, None, [], window_mode="sliding", window_size=3,
+        collapse_consecutive=False, dedup_pairs_per_line=False, self_loop_mode="remove",
+        edge_count=50, min_cooc=1, spring_iterations=500,
+    )
+    assert calls == [service.LARGE_GRAPH_FA2_ITERATIONS]
+    assert set(layout.pos) == set(layout.graph.nodes())
+    assert max(abs(c) for p in layout.pos.values() for c in p) <= 2 + 1e-9
+
+
+def test_top_items_matches_sorted_order_including_ties():
+    from services.visualization import _top_items
+
+    word_freq = {f"w{i}": (i * 7) % 5 for i in range(40)}
+    expected = dict(sorted(word_freq.items(), key=lambda kv: kv[1], reverse=True)[:12])
+    assert list(_top_items(word_freq, 12).items()) == list(expected.items())
+
+
+def test_frequency_figure_keeps_size_of_given_figure():
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(4, 3))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        assert VisualizationService().build_frequency_figure(WORD_FREQ, fig=fig) is fig
+    assert tuple(fig.get_size_inches()) == (4, 3)